@@ -16,16 +16,25 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 # Load task modules from all registered Django apps.
 app.autodiscover_tasks()
 
-# Celery Beat Schedule for daily notifications at 6:30 AM
+# Celery Beat Schedule: reminders at each user's chosen time
 app.conf.beat_schedule = {
-    'trigger-chrome-notifications': {
-        'task': 'accounts.tasks.send_chrome_notification_trigger',
-        'schedule': crontab(hour=6, minute=30),  # 6:30 AM daily
+    'dispatch-chrome-notifications': {
+        'task': 'accounts.tasks.dispatch_chrome_notification_triggers',
+        'schedule': crontab(),  # every minute, for users whose time fell in the look-back window
     },
     'cleanup-old-triggers': {
         'task': 'accounts.tasks.cleanup_old_notification_triggers',
         'schedule': crontab(hour=2, minute=0),  # 2:00 AM daily cleanup
     },
+    'rollup-daily-attendance': {
+        'task': 'accounts.tasks.rollup_daily_attendance',
+        'schedule': crontab(hour=1, minute=30),  # 1:30 AM, days changed since the last run
+    },
+    'rollup-daily-attendance-full': {
+        'task': 'accounts.tasks.rollup_daily_attendance',
+        'schedule': crontab(hour=3, minute=0, day_of_week='sunday'),  # weekly full recount, catches deletions
+        'kwargs': {'full': True},
+    },
 }
 
 app.conf.timezone = 'Asia/Kolkata'
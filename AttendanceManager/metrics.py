@@ -0,0 +1,151 @@
+"""
+In-process request metrics, exposed in Prometheus text format at /metrics.
+
+MetricsMiddleware records, per view: request latency, number of SQL queries
+and time spent in SQL (via connection.execute_wrapper). Values are kept in
+memory per process, so each worker reports its own numbers.
+"""
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """
+    A Prometheus-style histogram with one series per ``view`` label.
+    """
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {}
+
+    def observe(self, view, value):
+        with self.lock:
+            series = self.series.get(view)
+            if series is None:
+                series = self.series[view] = {'buckets': [0] * len(self.buckets), 'sum': 0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self.lock:
+            for view, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series['buckets']):
+                    lines.append(f'{self.name}_bucket{{view="{view}",le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{view="{view}",le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{view="{view}"}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{view="{view}"}} {series["count"]}')
+        return lines
+
+    def reset(self):
+        with self.lock:
+            self.series = {}
+
+
+request_duration = Histogram(
+    'http_request_duration_seconds', 'Request latency by view.', LATENCY_BUCKETS,
+)
+sql_queries = Histogram(
+    'http_request_sql_queries', 'SQL queries per request by view.', QUERY_COUNT_BUCKETS,
+)
+sql_duration = Histogram(
+    'http_request_sql_duration_seconds', 'Time spent in SQL per request by view.', LATENCY_BUCKETS,
+)
+
+HISTOGRAMS = (request_duration, sql_queries, sql_duration)
+
+
+class QueryTimer:
+    """
+    execute_wrapper that counts queries and adds up their duration.
+    """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    return match.view_name or match._func_path
+
+
+class MetricsMiddleware:
+    """
+    Records latency, SQL query count and SQL time for every resolved view.
+    Under ASGI the query timer is installed on the connection of the
+    request's sync thread, where sync views and the async ORM run queries.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        self.observe(request, time.perf_counter() - started, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        await sync_to_async(lambda: connection.execute_wrappers.append(timer))()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(lambda: connection.execute_wrappers.remove(timer))()
+        self.observe(request, time.perf_counter() - started, timer)
+        return response
+
+    def observe(self, request, elapsed, timer):
+        view = view_label(request)
+        if view:
+            request_duration.observe(view, elapsed)
+            sql_queries.observe(view, timer.count)
+            sql_duration.observe(view, timer.duration)
+
+
+def metrics(request):
+    """
+    Staff-only Prometheus scrape endpoint.
+    """
+    if not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden('Staff only.')
+
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4')
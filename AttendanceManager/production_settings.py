@@ -1,6 +1,7 @@
 """
 Production settings for PythonAnywhere deployment
 """
+import os
 from .settings import *
 from .secrets import *
 
@@ -26,6 +27,17 @@ DATABASES = {
     }
 }
 
+# Redis cache shared by every process (web workers, Celery, management
+# commands), so an attendance write in one of them invalidates the stats,
+# ETags and history fragments cached by the others. Not the database cache:
+# its hits would be MySQL queries, the very ones the cache is there to save
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', 'redis://localhost:6379/1'),
+    }
+}
+
 # Static files configuration
 STATIC_ROOT = '/home/gurupreetattendancemanager/mysite/static'
 STATIC_URL = '/static/'
@@ -46,11 +58,18 @@ SESSION_COOKIE_SECURE = True
 # SOCIAL AUTH SETTINGS
 SITE_ID = 1
 
+# request.user comes with its preferences in one query; sessions from the
+# stock backends are moved over by LegacyBackendSessionMiddleware
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
-    'allauth.account.auth_backends.AuthenticationBackend',
+    'accounts.backends.ModelBackend',
+    'accounts.backends.AuthenticationBackend',
 ]
 
+# Sessions are read from the Redis cache above and only hit MySQL on a miss.
+# settings.py picks database sessions because DEBUG is still on there
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
+
 SOCIALACCOUNT_PROVIDERS = {
     'google': {
         'SCOPE': [
@@ -0,0 +1,27 @@
+"""
+Route requests to the async views when running under ASGI.
+
+ASGI requests resolve through ASGI_URLCONF, which puts async versions of
+the polling endpoints in front of the normal URLs. WSGI requests keep the
+sync views: under WSGI an async view would cost an event loop per request.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+
+
+class AsgiUrlconfMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        # Checked per request: a sync-only middleware further in makes Django
+        # run this one in sync mode even under ASGI
+        if isinstance(request, ASGIRequest):
+            request.urlconf = settings.ASGI_URLCONF
+        return self.get_response(request)
@@ -63,14 +63,73 @@ if os.getenv('DEBUG', 'True') == 'True':
 # CELERY SETTINGS (Only for development)
 if DEBUG:
     CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379')
+    # Chords (the fanned-out reminder job) need a result backend
+    CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379')
     CELERY_ACCEPT_CONTENT = ['application/json']
     CELERY_RESULT_SERIALIZER = 'json'
     CELERY_TASK_SERIALIZER = 'json'
     CELERY_TIMEZONE = 'Asia/Kolkata'
 
+# Cache (locmem by default; set CACHE_BACKEND/CACHE_LOCATION for file or Redis, e.g.
+# django.core.cache.backends.redis.RedisCache with redis://localhost:6379/1).
+# Locmem is per process: writes from Celery or management commands don't
+# invalidate the dev server's cached stats. Production uses Redis.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'attendance-manager'),
+    }
+}
+ATTENDANCE_STATS_CACHE_TIMEOUT = 60 * 60  # seconds; writes invalidate sooner via the version
+ATTENDANCE_HISTORY_CACHE_TIMEOUT = 60 * 60  # dashboard history fragments, same versioning
+
+# Sessions are read from the cache and only hit the database on a miss in
+# production, which needs a cache that is not the database (see the
+# my_attendance deploy checks); development keeps plain database sessions.
+# DEBUG is only final in production_settings, which sets the engine itself
+SESSION_ENGINE = os.getenv(
+    'SESSION_ENGINE',
+    'django.contrib.sessions.backends.db' if DEBUG else 'django.contrib.sessions.backends.cached_db',
+)
+
+# Days recounted per GROUP BY by the nightly attendance rollup
+ATTENDANCE_ROLLUP_CHUNK_SIZE = int(os.getenv('ATTENDANCE_ROLLUP_CHUNK_SIZE', 500))
+
+# Attendance percentage below which the staff dashboard flags a user
+ATTENDANCE_LOW_THRESHOLD = 75
+
+# Rows per bulk INSERT when the reminder task creates notification triggers
+NOTIFICATION_TRIGGER_CHUNK_SIZE = int(os.getenv('NOTIFICATION_TRIGGER_CHUNK_SIZE', 1000))
+
+# User-id range handled by each subtask of the fanned-out reminder job
+NOTIFICATION_TRIGGER_PARTITION_SIZE = int(os.getenv('NOTIFICATION_TRIGGER_PARTITION_SIZE', 10000))
+
+# Batched deletion of expired notification triggers
+NOTIFICATION_CLEANUP_BATCH_SIZE = int(os.getenv('NOTIFICATION_CLEANUP_BATCH_SIZE', 5000))
+NOTIFICATION_CLEANUP_SLEEP = float(os.getenv('NOTIFICATION_CLEANUP_SLEEP', 0.1))  # seconds between batches
+
+# Minutes of reminder times each dispatcher tick re-checks, so a late or
+# skipped tick is caught up without rescanning the whole day
+NOTIFICATION_DISPATCH_LOOKBACK = int(os.getenv('NOTIFICATION_DISPATCH_LOOKBACK', 15))
+
+# Time zone users' chrome_notification_time is interpreted in
+NOTIFICATION_TIME_ZONE = os.getenv('NOTIFICATION_TIME_ZONE', 'Asia/Kolkata')
+
+# Server-Sent Events for notification triggers (served under ASGI only).
+# Triggers are created by the Celery worker, so point the bus at Redis
+# ('accounts.events.RedisEventBus') to reach streams in the ASGI server; the
+# in-memory bus only reaches streams in the process that created the trigger
+NOTIFICATION_EVENT_BUS = os.getenv('NOTIFICATION_EVENT_BUS', 'accounts.events.InMemoryEventBus')
+NOTIFICATION_EVENT_BUS_URL = os.getenv('NOTIFICATION_EVENT_BUS_URL', 'redis://localhost:6379')
+NOTIFICATION_STREAM_HEARTBEAT = 25  # seconds between keep-alive comments
+NOTIFICATION_STREAM_MAX_AGE = 600  # seconds before the stream closes and the browser reconnects
+
 MIDDLEWARE = [
+    'AttendanceManager.metrics.MetricsMiddleware',
+    'AttendanceManager.routing.AsgiUrlconfMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'accounts.backends.LegacyBackendSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -80,6 +139,8 @@ MIDDLEWARE = [
 ]
 
 ROOT_URLCONF = 'AttendanceManager.urls'
+# Under ASGI the polling endpoints are served by async views
+ASGI_URLCONF = 'AttendanceManager.urls_asgi'
 
 TEMPLATES = [
     {
@@ -107,6 +168,16 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so concurrent
+            # attendance upserts wait their turn instead of failing
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # File-backed test database: the in-memory one uses shared-cache table
+        # locks, which fail concurrent tests instead of waiting
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
@@ -176,9 +247,17 @@ SITE_ID = 1
 
 
 AUTHENTICATION_BACKENDS = [
-    'django.contrib.auth.backends.ModelBackend',
-    'allauth.account.auth_backends.AuthenticationBackend',
+    # Same backends, but request.user comes with its preferences in one query
+    'accounts.backends.ModelBackend',
+    'accounts.backends.AuthenticationBackend',
 ]
+# Sessions store the backend they logged in with. LegacyBackendSessionMiddleware
+# moves sessions created before the switch to the replacements; drop both once
+# SESSION_COOKIE_AGE (two weeks) has passed since the deploy
+LEGACY_AUTHENTICATION_BACKENDS = {
+    'django.contrib.auth.backends.ModelBackend': 'accounts.backends.ModelBackend',
+    'allauth.account.auth_backends.AuthenticationBackend': 'accounts.backends.AuthenticationBackend',
+}
 SOCIALACCOUNT_PROVIDERS = {
     'google': {
         'SCOPE':[
@@ -0,0 +1,17 @@
+"""
+URL configuration used under ASGI (see AttendanceManager.routing).
+
+The polling endpoints are served by their async versions; everything else
+falls through to the project's normal URLs.
+"""
+from django.urls import path
+from accounts import views as accounts_views
+from my_attendance import views as attendance_views
+from .urls import urlpatterns as wsgi_urlpatterns
+
+urlpatterns = [
+    path('api/attendance/today/', attendance_views.acheck_today_attendance, name='api_check_today'),
+    path('api/attendance/stats/', attendance_views.aget_attendance_stats, name='api_attendance_stats'),
+    path('notifications/check/', accounts_views.acheck_notification_triggers, name='check_notification_triggers'),
+    *wsgi_urlpatterns,
+]
@@ -0,0 +1,62 @@
+"""
+Authentication backends that load the session user together with their
+UserPreferences in one JOIN. request.user is resolved once per request, so
+views and templates reading request.user.preferences add no query.
+"""
+from allauth.account import auth_backends
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, backends
+from django.contrib.auth.models import User
+
+
+class PreferencesBackendMixin:
+    def get_user(self, user_id):
+        try:
+            user = User._default_manager.select_related('preferences').get(pk=user_id)
+        except User.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+class ModelBackend(PreferencesBackendMixin, backends.ModelBackend):
+    pass
+
+
+class AuthenticationBackend(PreferencesBackendMixin, auth_backends.AuthenticationBackend):
+    pass
+
+
+class LegacyBackendSessionMiddleware:
+    """
+    Point sessions that logged in through a stock backend at its
+    replacement (LEGACY_AUTHENTICATION_BACKENDS), so they stay valid
+    without listing the stock backends in AUTHENTICATION_BACKENDS, where
+    every failed login would run their authenticate() and hash the password
+    again. Goes between SessionMiddleware and AuthenticationMiddleware.
+    Remove it, and the setting, once SESSION_COOKIE_AGE has passed since the
+    switch: by then every old session has been rewritten or has expired.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(self.get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        backend = settings.LEGACY_AUTHENTICATION_BACKENDS.get(request.session.get(BACKEND_SESSION_KEY))
+        if backend:
+            request.session[BACKEND_SESSION_KEY] = backend
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        backend = settings.LEGACY_AUTHENTICATION_BACKENDS.get(await request.session.aget(BACKEND_SESSION_KEY))
+        if backend:
+            await request.session.aset(BACKEND_SESSION_KEY, backend)
+        return await self.get_response(request)
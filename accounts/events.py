@@ -0,0 +1,174 @@
+"""
+Event bus used to push NotificationTrigger events to open SSE streams.
+
+The in-memory bus only reaches streams served by the same process, which is
+enough for local development and tests. When triggers are created by a Celery
+worker, set NOTIFICATION_EVENT_BUS to 'accounts.events.RedisEventBus' so the
+worker's events reach the ASGI server. Streams subscribe before they read
+pending triggers from the database, so a trigger created while a stream
+(re)connects is either in that read or pushed right after it. Publishing is
+best effort: a bus that is down only delays triggers until the browser's
+next reconnect or poll.
+"""
+import asyncio
+import json
+import logging
+import threading
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    A single stream's view of the bus. ``get()`` waits for the next event.
+    """
+    def __init__(self, bus, user_id):
+        self.bus = bus
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    async def start(self):
+        """
+        Start receiving events. Streams call this before reading pending
+        triggers; in-memory subscriptions receive events from subscribe() on.
+        """
+
+    async def get(self, timeout):
+        """
+        Return the next event, or None if nothing arrived within ``timeout`` seconds.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def put(self, event):
+        # Publishers run in sync threads (views, tasks), subscribers on the event loop
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, event)
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class InMemoryEventBus:
+    """
+    Process-local pub/sub keyed by user id.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id)
+        with self.lock:
+            self.subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, user_id, event):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(event)
+
+
+class RedisSubscription(Subscription):
+    def __init__(self, bus, user_id):
+        super().__init__(bus, user_id)
+        self.pubsub = None
+
+    async def start(self):
+        self.pubsub = self.bus.async_client().pubsub()
+        await self.pubsub.subscribe(self.bus.channel(self.user_id))
+
+    async def get(self, timeout):
+        message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if message is None:
+            return None
+        return json.loads(message['data'])
+
+    def close(self):
+        if self.pubsub is not None:
+            self.loop.create_task(self.pubsub.aclose())
+
+
+class RedisEventBus:
+    """
+    Cross-process pub/sub over Redis channels, one channel per user.
+    Requires the ``redis`` package.
+    """
+    def __init__(self):
+        import redis
+        self.url = settings.NOTIFICATION_EVENT_BUS_URL
+        self.client = redis.Redis.from_url(self.url)
+
+    def async_client(self):
+        import redis.asyncio
+        return redis.asyncio.Redis.from_url(self.url)
+
+    def channel(self, user_id):
+        return f'notifications:{user_id}'
+
+    def subscribe(self, user_id):
+        return RedisSubscription(self, user_id)
+
+    def unsubscribe(self, subscription):
+        pass
+
+    def publish(self, user_id, event):
+        self.client.publish(self.channel(user_id), json.dumps(event))
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+@receiver(setting_changed)
+def reset_event_bus(setting, **kwargs):
+    # Tests switch buses with override_settings
+    global _bus
+    if setting in ('NOTIFICATION_EVENT_BUS', 'NOTIFICATION_EVENT_BUS_URL'):
+        with _bus_lock:
+            _bus = None
+
+
+def get_event_bus():
+    """
+    Return the process-wide bus configured by NOTIFICATION_EVENT_BUS.
+    """
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = import_string(settings.NOTIFICATION_EVENT_BUS)()
+        return _bus
+
+
+def trigger_event(trigger):
+    return {
+        'id': trigger.id,
+        'notification_type': trigger.notification_type,
+        'created_at': trigger.created_at.isoformat(),
+    }
+
+
+def publish_trigger(trigger):
+    """
+    Push a newly created NotificationTrigger to the user's open streams.
+    Runs from on_commit, after the trigger is saved, so a failing bus is
+    logged rather than raised.
+    """
+    try:
+        get_event_bus().publish(trigger.user_id, trigger_event(trigger))
+    except Exception:
+        logger.exception(f"Failed to publish notification trigger {trigger.id}")
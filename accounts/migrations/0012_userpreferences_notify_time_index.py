@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_remove_email_notification_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userpreferences',
+            index=models.Index(fields=['chrome_notifications_enabled', 'chrome_notification_time'], name='prefs_notify_time_idx'),
+        ),
+    ]
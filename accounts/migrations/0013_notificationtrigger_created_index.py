@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:32
+
+from django.conf import settings
+from django.db import migrations, models
+from my_attendance.db import AddIndexOnline
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_userpreferences_notify_time_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexOnline(
+            model_name='notificationtrigger',
+            index=models.Index(fields=['created_at'], name='trigger_created_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_online_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationtrigger',
+            name='trigger_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='notificationtrigger',
+            constraint=models.UniqueConstraint(fields=('user', 'notification_type', 'trigger_date'), name='trigger_once_per_day'),
+        ),
+    ]
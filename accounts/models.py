@@ -4,6 +4,7 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.db import transaction
 import datetime
 
 class UserPreferences(models.Model):
@@ -12,6 +13,15 @@ class UserPreferences(models.Model):
     total_school_days = models.IntegerField(default=220)
     chrome_notifications_enabled = models.BooleanField(default=True)
 
+    class Meta:
+        indexes = [
+            # Per-minute reminder dispatch: equality on enabled, then range on time
+            models.Index(
+                fields=['chrome_notifications_enabled', 'chrome_notification_time'],
+                name='prefs_notify_time_idx',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s preferences"
 
@@ -24,20 +34,53 @@ class NotificationTrigger(models.Model):
     notification_type = models.CharField(max_length=50, default='attendance_reminder')
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
+    # Reminder day (NOTIFICATION_TIME_ZONE) the trigger is for. Scheduled
+    # reminders set it so a user gets at most one per type per day; ad-hoc
+    # triggers leave it empty and are never deduplicated.
+    trigger_date = models.DateField(null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
+        constraints = [
+            # Dedup key: a retried or double-fired reminder task inserts nothing
+            models.UniqueConstraint(
+                fields=['user', 'notification_type', 'trigger_date'],
+                name='trigger_once_per_day',
+            ),
+        ]
+        indexes = [
+            # Range scans for cleanup of old triggers
+            models.Index(fields=['created_at'], name='trigger_created_idx'),
+            # Pending-trigger poll/claim: user + unread, newest first
+            models.Index(fields=['user', 'is_read', 'created_at'], name='trigger_poll_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.notification_type} at {self.created_at}"
 
+def get_user_preferences(user):
+    """
+    Return the user's preferences without a query when they were loaded with
+    the user (see accounts.backends). Users that predate the preferences
+    signal get their row created on first use.
+    """
+    try:
+        return user.preferences
+    except UserPreferences.DoesNotExist:
+        preferences, _ = UserPreferences.objects.get_or_create(user=user)
+        user.preferences = preferences
+        return preferences
+
 @receiver(post_save, sender=User)
 def create_user_preferences(sender, instance, created, **kwargs):
+    # Only new users need a row; saving an existing user (every login updates
+    # last_login) no longer checks for one, get_user_preferences backfills it
     if created:
         UserPreferences.objects.create(user=instance)
 
-@receiver(post_save, sender=User)
-def save_user_preferences(sender, instance, **kwargs):
-    # Only create preferences if they don't exist, don't overwrite existing ones
-    if not hasattr(instance, 'preferences'):
-        UserPreferences.objects.create(user=instance)
+@receiver(post_save, sender=NotificationTrigger)
+def publish_notification_trigger(sender, instance, created, **kwargs):
+    # Push new triggers to open notification streams once the row is committed
+    if created:
+        from .events import publish_trigger
+        transaction.on_commit(lambda: publish_trigger(instance))
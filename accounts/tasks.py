@@ -1,48 +1,375 @@
-from celery import shared_task
-from django.contrib.auth.models import User
+from celery import chord, group, shared_task
+from celery.result import allow_join_result
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.db.models import Exists, Max, Min, OuterRef
 from django.utils import timezone
+from zoneinfo import ZoneInfo
 import datetime
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-@shared_task
-def send_chrome_notification_trigger():
+# Incremental rollups re-read this much before the previous run started, so
+# writes that committed while that run was scanning are not missed
+ROLLUP_WATERMARK_OVERLAP = datetime.timedelta(minutes=10)
+
+def chunked(iterable, size):
     """
-    Trigger chrome notifications for users who have them enabled.
-    This creates a database record that the frontend can check.
+    Yield lists of up to ``size`` items from ``iterable``.
     """
-    from .models import UserPreferences, NotificationTrigger
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def create_notification_triggers(user_ids, notification_type='attendance_reminder', trigger_date=None):
+    """
+    Insert one trigger per user for ``trigger_date`` (default: today's
+    reminder date) with a single bulk INSERT and push them to open
+    notification streams (bulk_create skips the post_save hook).
+    Users who already have that day's trigger are skipped by the
+    (user, notification_type, trigger_date) constraint, so retries insert
+    nothing. Returns the triggers that were actually inserted.
+    """
+    from .models import NotificationTrigger
+    from .events import publish_trigger
     
-    # Get users with chrome notifications enabled
-    users = User.objects.filter(preferences__chrome_notifications_enabled=True)
+    trigger_date = trigger_date or reminder_date()
+    stamped = NotificationTrigger.objects.bulk_create([
+        NotificationTrigger(user_id=user_id, notification_type=notification_type, trigger_date=trigger_date)
+        for user_id in user_ids
+    ], ignore_conflicts=True)
     
+    # Rows come back without ids, so read them back by the dedup key. A row is
+    # ours only if it has the created_at this call stamped on it: one inserted
+    # by an overlapping run (the double-fire case) has that run's timestamp
+    created_at = {trigger.user_id: trigger.created_at for trigger in stamped}
+    triggers = [
+        trigger
+        for trigger in NotificationTrigger.objects.filter(
+            user_id__in=user_ids,
+            notification_type=notification_type,
+            trigger_date=trigger_date,
+        )
+        if trigger.created_at == created_at[trigger.user_id]
+    ]
+    transaction.on_commit(lambda: [publish_trigger(trigger) for trigger in triggers])
+    return triggers
+
+def trigger_users(user_ids, chunk_size, trigger_date=None):
+    """
+    Create reminder triggers for every user id in the ``user_ids`` queryset,
+    streaming the ids and inserting ``chunk_size`` triggers per query.
+    Returns (created, failed) counts.
+    """
     count = 0
-    for user in users:
+    failed = 0
+    for chunk in chunked(user_ids.iterator(chunk_size=chunk_size), chunk_size):
         try:
-            # Create a notification trigger record
-            NotificationTrigger.objects.create(
-                user=user,
-                notification_type='attendance_reminder',
-                created_at=timezone.now()
-            )
-            count += 1
-            logger.info(f"Chrome notification trigger created for {user.username}")
-        except Exception as e:
-            logger.error(f"Failed to create notification trigger for {user.username}: {str(e)}")
-    
-    logger.info(f"Created {count} chrome notification triggers")
+            count += len(create_notification_triggers(chunk, trigger_date=trigger_date))
+        except DatabaseError as e:
+            failed += len(chunk)
+            logger.error(f"Failed to create {len(chunk)} notification triggers: {str(e)}")
+    return count, failed
+
+def reminder_user_ids(day=None):
+    """
+    Ids of users with chrome notifications enabled who have not marked
+    attendance for ``day`` (default: today) yet and have not been reminded
+    for it. The anti-joins run in SQL (NOT EXISTS), so diligent users never
+    produce a trigger row and a re-run only picks up users it missed.
+    """
+    from .models import NotificationTrigger, UserPreferences
+    from my_attendance.models import Attendance
+    
+    today = day or reminder_date()
+    marked_today = Attendance.objects.filter(
+        user_id=OuterRef('user_id'),
+        date=today
+    )
+    reminded_today = NotificationTrigger.objects.filter(
+        user_id=OuterRef('user_id'),
+        notification_type='attendance_reminder',
+        trigger_date=today
+    )
+    return UserPreferences.objects.filter(
+        ~Exists(marked_today),
+        ~Exists(reminded_today),
+        chrome_notifications_enabled=True
+    ).order_by('user_id').values_list('user_id', flat=True)
+
+def reminder_date():
+    """
+    Today's date in NOTIFICATION_TIME_ZONE.
+    """
+    return timezone.localdate(timezone=ZoneInfo(settings.NOTIFICATION_TIME_ZONE))
+
+def dispatch_windows(end, lookback):
+    """
+    Split the reminder-time window [end - lookback, end) (naive datetimes in
+    NOTIFICATION_TIME_ZONE) at midnight into (day, start, stop) pieces, so a
+    window reaching back into yesterday reminds yesterday's late users for
+    yesterday. ``stop`` is None when the piece runs to the end of the day.
+    """
+    windows = []
+    start = end - lookback
+    while start < end:
+        midnight = datetime.datetime.combine(start.date() + datetime.timedelta(days=1), datetime.time.min)
+        stop = min(end, midnight)
+        windows.append((start.date(), start.time(), None if stop == midnight else stop.time()))
+        start = stop
+    return windows
+
+def current_reminder_minute(now=None):
+    """
+    The current minute in NOTIFICATION_TIME_ZONE, the zone users pick their
+    reminder time in.
+    """
+    now = timezone.localtime(now or timezone.now(), ZoneInfo(settings.NOTIFICATION_TIME_ZONE))
+    return now.time().replace(second=0, microsecond=0)
+
+def user_id_partitions(user_ids, partition_size):
+    """
+    Split the id range of ``user_ids`` into [start, end) ranges of
+    ``partition_size`` ids, read from the index bounds.
+    """
+    bounds = user_ids.order_by().aggregate(low=Min('user_id'), high=Max('user_id'))
+    if bounds['low'] is None:
+        return []
+    return [
+        (start, start + partition_size)
+        for start in range(bounds['low'], bounds['high'] + 1, partition_size)
+    ]
+
+def run_trigger_chord(task, chunks, summary):
+    """
+    Run create_chrome_notification_trigger_chunk signatures as a group with
+    ``summary`` as the chord callback. When ``task`` runs eagerly (apply(),
+    CELERY_TASK_ALWAYS_EAGER or a direct call) the chord runs in-process and
+    the summary is returned; otherwise it is sent to the workers and None is
+    returned. With no chunks the summary runs at once.
+    """
+    if not chunks:
+        return summary.apply(args=([],)).get()
+    
+    job = chord(group(chunks), summary)
+    if task.request.is_eager or task.request.called_directly:
+        # Nothing is sent to the broker, so joining the in-process chord can't block
+        with allow_join_result():
+            return job.apply().get()
+    
+    job.apply_async()
+    return None
+
+@shared_task(bind=True)
+def send_chrome_notification_trigger(self, chunk_size=None, partition_size=None):
+    """
+    Trigger chrome notifications for users who have them enabled.
+    This creates a database record that the frontend can check.
+    
+    Users are partitioned into user-id ranges of ``partition_size``
+    (default NOTIFICATION_TRIGGER_PARTITION_SIZE), and a group of
+    create_chrome_notification_trigger_chunk subtasks, one per range, runs
+    on however many workers there are. A chord callback adds up the counts.
+    When run eagerly the same chord runs in-process and its summary is returned.
+    """
+    from .models import UserPreferences
+    
+    partition_size = partition_size or settings.NOTIFICATION_TRIGGER_PARTITION_SIZE
+    enabled = UserPreferences.objects.filter(chrome_notifications_enabled=True).values('user_id')
+    partitions = user_id_partitions(enabled, partition_size)
+    
+    result = run_trigger_chord(
+        self,
+        [create_chrome_notification_trigger_chunk.s(start, end, chunk_size) for start, end in partitions],
+        summarize_chrome_notification_triggers.s(started=time.time()),
+    )
+    if result is not None:
+        return result
+    logger.info(f"Dispatched {len(partitions)} chrome notification trigger chunks")
+    return f"Dispatched {len(partitions)} chrome notification trigger chunks"
+
+@shared_task
+def create_chrome_notification_trigger_chunk(start_id, end_id, chunk_size=None, day=None, window_start=None, window_stop=None):
+    """
+    Create reminder triggers for the users with start_id <= id < end_id.
+    The dispatcher also passes its window: only users whose reminder time is
+    in [window_start, window_stop) ('HH:MM:SS', no stop meaning end of day)
+    are reminded, for ``day`` ('YYYY-MM-DD', default today).
+    One subtask of send_chrome_notification_trigger and
+    dispatch_chrome_notification_triggers.
+    """
+    chunk_size = chunk_size or settings.NOTIFICATION_TRIGGER_CHUNK_SIZE
+    day = datetime.date.fromisoformat(day) if day else None
+    user_ids = reminder_user_ids(day).filter(user_id__gte=start_id, user_id__lt=end_id)
+    if window_start is not None:
+        user_ids = user_ids.filter(chrome_notification_time__gte=window_start)
+    if window_stop is not None:
+        user_ids = user_ids.filter(chrome_notification_time__lt=window_stop)
+    count, failed = trigger_users(user_ids, chunk_size, trigger_date=day)
+    return {'created': count, 'failed': failed}
+
+@shared_task
+def summarize_chrome_notification_triggers(results, started=None, bucket=None):
+    """
+    Chord callback of the reminder fan-outs: add up the chunks. ``bucket``
+    is the minute a dispatcher tick ran for.
+    """
+    count = sum(result['created'] for result in results)
+    failed = sum(result['failed'] for result in results)
+    
+    elapsed = time.time() - started if started else 0
+    if bucket:
+        logger.info(
+            f"Dispatched {count} chrome notification triggers for {bucket} in {elapsed:.2f}s "
+            f"({failed} failed, {len(results)} chunks)"
+        )
+        return f"Dispatched {count} chrome notification triggers for {bucket}"
+    logger.info(
+        f"Created {count} chrome notification triggers in {elapsed:.2f}s "
+        f"({failed} failed, {len(results)} chunks)"
+    )
     return f"Created {count} chrome notification triggers"
 
+@shared_task(bind=True)
+def dispatch_chrome_notification_triggers(self, bucket=None, chunk_size=None, partition_size=None):
+    """
+    Trigger chrome notifications for users whose chrome_notification_time
+    falls in the last NOTIFICATION_DISPATCH_LOOKBACK minutes, up to the end
+    of the current minute, and who have not been reminded that day. Runs
+    every minute from Celery beat, so reminders go out at each user's chosen
+    time and the load is spread out. A tick that runs late or is skipped is
+    caught up by the next one within the look-back; reminders are
+    deduplicated per day, so the overlap reminds nobody twice.
+    ``bucket`` ('HH:MM') overrides the current minute.
+    
+    Popular minutes (the default 06:30) hold many users, so each window is
+    fanned out like send_chrome_notification_trigger: a chord of
+    create_chrome_notification_trigger_chunk subtasks over user-id ranges.
+    """
+    from .models import UserPreferences
+    
+    partition_size = partition_size or settings.NOTIFICATION_TRIGGER_PARTITION_SIZE
+    
+    if bucket:
+        today, start = reminder_date(), datetime.time.fromisoformat(bucket)
+    else:
+        now = timezone.localtime(timezone.now(), ZoneInfo(settings.NOTIFICATION_TIME_ZONE))
+        today, start = now.date(), current_reminder_minute(now)
+    end = datetime.datetime.combine(today, start) + datetime.timedelta(minutes=1)
+    lookback = datetime.timedelta(minutes=settings.NOTIFICATION_DISPATCH_LOOKBACK)
+    
+    chunks = []
+    for day, window_start, window_stop in dispatch_windows(end, lookback):
+        # Indexed range lookup on (chrome_notifications_enabled, chrome_notification_time)
+        due = UserPreferences.objects.filter(
+            chrome_notifications_enabled=True,
+            chrome_notification_time__gte=window_start,
+        )
+        if window_stop is not None:
+            due = due.filter(chrome_notification_time__lt=window_stop)
+        window = {
+            'day': day.isoformat(),
+            'window_start': window_start.isoformat(),
+            'window_stop': window_stop.isoformat() if window_stop else None,
+        }
+        chunks.extend(
+            create_chrome_notification_trigger_chunk.s(first, last, chunk_size, **window)
+            for first, last in user_id_partitions(due.values('user_id'), partition_size)
+        )
+    
+    result = run_trigger_chord(
+        self,
+        chunks,
+        summarize_chrome_notification_triggers.s(started=time.time(), bucket=f'{start:%H:%M}'),
+    )
+    if result is not None:
+        return result
+    logger.info(f"Dispatched {len(chunks)} chrome notification trigger chunks for {start:%H:%M}")
+    return f"Dispatched {len(chunks)} chrome notification trigger chunks for {start:%H:%M}"
+
 @shared_task
-def cleanup_old_notification_triggers():
+def cleanup_old_notification_triggers(batch_size=None, sleep=None):
     """
     Clean up notification triggers older than 24 hours.
+    Rows are deleted in primary-key ranges of ``batch_size`` with a pause of
+    ``sleep`` seconds between batches, so each DELETE holds its locks briefly
+    and the morning polls are not stalled behind one huge statement.
     """
     from .models import NotificationTrigger
     
+    batch_size = batch_size or settings.NOTIFICATION_CLEANUP_BATCH_SIZE
+    sleep = settings.NOTIFICATION_CLEANUP_SLEEP if sleep is None else sleep
+    started = time.monotonic()
+    
     cutoff_time = timezone.now() - datetime.timedelta(hours=24)
-    deleted_count = NotificationTrigger.objects.filter(created_at__lt=cutoff_time).delete()[0]
+    old_triggers = NotificationTrigger.objects.filter(created_at__lt=cutoff_time)
+    
+    # Id bounds of the expired rows, read from the created_at index
+    bounds = old_triggers.order_by().aggregate(low=Min('id'), high=Max('id'))
     
-    logger.info(f"Cleaned up {deleted_count} old notification triggers")
+    deleted_count = 0
+    batches = 0
+    if bounds['low'] is not None:
+        for batch_start in range(bounds['low'], bounds['high'] + 1, batch_size):
+            if batches and sleep:
+                time.sleep(sleep)
+            deleted_count += old_triggers.filter(
+                id__gte=batch_start,
+                id__lt=batch_start + batch_size
+            ).delete()[0]
+            batches += 1
+    
+    elapsed = time.monotonic() - started
+    rate = deleted_count / elapsed if elapsed else 0
+    logger.info(
+        f"Cleaned up {deleted_count} old notification triggers in {batches} batches "
+        f"({elapsed:.2f}s, {rate:.0f} rows/s)"
+    )
     return f"Cleaned up {deleted_count} old notification triggers"
+
+@shared_task
+def rollup_daily_attendance(full=False, chunk_size=None):
+    """
+    Roll site-wide attendance up into DailyAttendanceRollup, one row per day.
+    Only days with an Attendance row updated since the previous run are
+    recounted (found through the updated_at index), ``chunk_size`` days per
+    GROUP BY. ``full`` recounts every day and drops the rollups of days left
+    without records, which also catches deletions: a deleted row leaves no
+    updated_at behind.
+    """
+    from my_attendance.models import Attendance, DailyAttendanceRollup
+    from my_attendance.stats import rollup_attendance_days
+    
+    chunk_size = chunk_size or settings.ATTENDANCE_ROLLUP_CHUNK_SIZE
+    started = time.monotonic()
+    computed_at = timezone.now()
+    
+    changed = Attendance.objects.all()
+    last_run = None
+    if not full:
+        last_run = DailyAttendanceRollup.objects.aggregate(last=Max('computed_at'))['last']
+    if last_run:
+        changed = changed.filter(updated_at__gte=last_run - ROLLUP_WATERMARK_OVERLAP)
+    dates = list(changed.order_by('date').values_list('date', flat=True).distinct())
+    
+    for chunk in chunked(dates, chunk_size):
+        with transaction.atomic():
+            rollup_attendance_days(chunk, computed_at)
+    
+    removed = 0
+    if full:
+        removed = DailyAttendanceRollup.objects.filter(computed_at__lt=computed_at).delete()[0]
+    
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Rolled up {len(dates)} attendance days in {elapsed:.2f}s "
+        f"({'full' if full else f'changed since {last_run}'}, {removed} stale days removed)"
+    )
+    return f"Rolled up {len(dates)} attendance days"
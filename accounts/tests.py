@@ -1,8 +1,15 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, AsyncClient, override_settings
 from django.contrib.auth.models import User
-from .models import UserPreferences
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.core.cache import cache
+from asgiref.sync import sync_to_async
+from .models import UserPreferences, NotificationTrigger
 from django.urls import reverse
+import datetime
 import json
+from unittest import mock
 
 class AccountsApiTests(TestCase):
     def setUp(self):
@@ -47,3 +54,419 @@ class AccountsApiTests(TestCase):
         url = reverse('changefirstname')
         response = self.client.post(url, {'first_name': ''})
         self.assertEqual(json.loads(response.content)['success'], False)
+
+
+class NotificationTriggerApiTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+        self.triggers = [NotificationTrigger.objects.create(user=self.user) for _ in range(3)]
+
+    def test_claim_returns_and_marks_pending(self):
+        url = reverse('claim_notification_triggers')
+        with CaptureQueriesContext(connection) as queries:
+            data = json.loads(self.client.post(url).content)
+        # One SELECT and one UPDATE, however many triggers are pending
+        trigger_queries = [q for q in queries if 'accounts_notificationtrigger' in q['sql']]
+        self.assertEqual(len(trigger_queries), 2)
+        self.assertEqual(data['count'], 3)
+        self.assertFalse(NotificationTrigger.objects.filter(user=self.user, is_read=False).exists())
+
+        # A second tab claiming afterwards gets nothing
+        data = json.loads(self.client.post(url).content)
+        self.assertEqual(data['count'], 0)
+
+    def test_batch_mark_read(self):
+        url = reverse('mark_notification_read')
+        ids = [trigger.id for trigger in self.triggers[:2]]
+        response = self.client.post(url, json.dumps({'trigger_ids': ids}), content_type='application/json')
+        data = json.loads(response.content)
+        self.assertTrue(data['success'])
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(NotificationTrigger.objects.filter(user=self.user, is_read=False).count(), 1)
+
+    def test_mark_read_other_users_trigger(self):
+        other = User.objects.create_user(username='other', password='password123')
+        trigger = NotificationTrigger.objects.create(user=other)
+        url = reverse('mark_notification_read')
+        response = self.client.post(url, json.dumps({'trigger_id': trigger.id}), content_type='application/json')
+        self.assertFalse(json.loads(response.content)['success'])
+        trigger.refresh_from_db()
+        self.assertFalse(trigger.is_read)
+
+    async def test_check_is_async_under_asgi(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        response = await client.get(reverse('check_notification_triggers'))
+        self.assertEqual(response.resolver_match.func.__name__, 'acheck_notification_triggers')
+        self.assertEqual(json.loads(response.content)['count'], 3)
+
+
+@override_settings(
+    NOTIFICATION_EVENT_BUS='accounts.events.InMemoryEventBus',
+    NOTIFICATION_STREAM_HEARTBEAT=1,
+    NOTIFICATION_STREAM_MAX_AGE=5,
+)
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+
+    def test_stream_requires_asgi(self):
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('notification_stream'))
+        self.assertEqual(response.status_code, 503)
+
+    async def test_stream_sends_pending_and_new_triggers(self):
+        pending = await NotificationTrigger.objects.acreate(user=self.user)
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+
+        response = await client.get(reverse('notification_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        chunk = (await anext(stream)).decode()
+        self.assertIn('event: trigger', chunk)
+        self.assertIn(f'"id": {pending.id}', chunk)
+
+        def create_trigger():
+            with self.captureOnCommitCallbacks(execute=True):
+                return NotificationTrigger.objects.create(user=self.user)
+
+        # The stream is now subscribed; a new trigger is pushed through the bus
+        created = await sync_to_async(create_trigger)()
+        chunk = (await anext(stream)).decode()
+        while chunk.startswith(':'):
+            chunk = (await anext(stream)).decode()
+        self.assertIn(f'"id": {created.id}', chunk)
+        await stream.aclose()
+
+    def test_publish_failure_is_logged_not_raised(self):
+        with self.settings(NOTIFICATION_EVENT_BUS='accounts.events.RedisEventBus'), \
+                mock.patch('accounts.events.RedisEventBus.__init__', side_effect=ConnectionError('bus down')), \
+                self.assertLogs('accounts.events', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True):
+            trigger = NotificationTrigger.objects.create(user=self.user)
+        self.assertTrue(NotificationTrigger.objects.filter(pk=trigger.pk).exists())
+
+    async def test_stream_sends_trigger_created_while_connecting_once(self):
+        from .events import get_event_bus, publish_trigger
+        pending = await NotificationTrigger.objects.acreate(user=self.user)
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+
+        response = await client.get(reverse('notification_stream'))
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await anext(stream)).startswith(b'retry:'))
+        # Subscribed before the pending read, so this event is queued as well
+        self.assertTrue(get_event_bus().subscriptions.get(self.user.pk))
+        self.assertIn(f'"id": {pending.id}', (await anext(stream)).decode())
+
+        created = await NotificationTrigger.objects.acreate(user=self.user)
+        await sync_to_async(publish_trigger)(pending)
+        await sync_to_async(publish_trigger)(created)
+        chunk = (await anext(stream)).decode()
+        while chunk.startswith(':'):
+            chunk = (await anext(stream)).decode()
+        self.assertIn(f'"id": {created.id}', chunk)
+        await stream.aclose()
+
+
+class NotificationTaskTests(TestCase):
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(username=f'user{i}', password='password123')
+            for i in range(5)
+        ]
+        UserPreferences.objects.filter(user=self.users[0]).update(chrome_notifications_enabled=False)
+
+    def test_trigger_task_creates_in_chunks(self):
+        from .tasks import send_chrome_notification_trigger
+        with CaptureQueriesContext(connection) as queries:
+            result = send_chrome_notification_trigger(chunk_size=2)
+        self.assertEqual(result, 'Created 4 chrome notification triggers')
+        inserts = [q for q in queries if q['sql'].startswith('INSERT') and 'INTO "accounts_notificationtrigger"' in q['sql']]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(
+            set(NotificationTrigger.objects.values_list('user_id', flat=True)),
+            {user.pk for user in self.users[1:]},
+        )
+
+    def test_rerun_creates_no_duplicate_triggers(self):
+        from .tasks import send_chrome_notification_trigger, reminder_date
+        send_chrome_notification_trigger()
+        self.assertEqual(send_chrome_notification_trigger(), 'Created 0 chrome notification triggers')
+        self.assertEqual(NotificationTrigger.objects.count(), 4)
+        self.assertEqual(set(NotificationTrigger.objects.values_list('trigger_date', flat=True)), {reminder_date()})
+
+    def test_duplicate_inserts_are_ignored(self):
+        from .tasks import create_notification_triggers
+        user_ids = [user.pk for user in self.users[:3]]
+        with self.captureOnCommitCallbacks(execute=True), \
+                mock.patch('accounts.events.publish_trigger') as publish:
+            first = create_notification_triggers(user_ids[:2])
+            # A retry racing the first run: only the third user is new
+            second = create_notification_triggers(user_ids)
+        self.assertEqual({trigger.user_id for trigger in first}, set(user_ids[:2]))
+        self.assertEqual({trigger.user_id for trigger in second}, set(user_ids[2:]))
+        self.assertEqual(publish.call_count, 3)
+        self.assertEqual(NotificationTrigger.objects.count(), 3)
+
+    def test_overlapping_run_triggers_are_not_counted(self):
+        from .tasks import create_notification_triggers, reminder_date
+        user_ids = [user.pk for user in self.users[1:4]]
+        bulk_create = NotificationTrigger.objects.bulk_create
+
+        def overlapping_run(objs, **kwargs):
+            # Another run started later but inserted the last user first
+            bulk_create([NotificationTrigger(user_id=user_ids[-1], trigger_date=reminder_date())])
+            return bulk_create(objs, **kwargs)
+
+        with self.captureOnCommitCallbacks(execute=True), \
+                mock.patch('accounts.events.publish_trigger') as publish, \
+                mock.patch.object(NotificationTrigger.objects, 'bulk_create', side_effect=overlapping_run):
+            created = create_notification_triggers(user_ids)
+        self.assertEqual({trigger.user_id for trigger in created}, set(user_ids[:2]))
+        self.assertEqual(publish.call_count, 2)
+        self.assertEqual(NotificationTrigger.objects.count(), 3)
+
+    def test_next_day_gets_a_new_trigger(self):
+        from .tasks import create_notification_triggers, reminder_date
+        today = reminder_date()
+        create_notification_triggers([self.users[1].pk], trigger_date=today - datetime.timedelta(days=1))
+        self.assertEqual(len(create_notification_triggers([self.users[1].pk], trigger_date=today)), 1)
+        self.assertEqual(NotificationTrigger.objects.filter(user=self.users[1]).count(), 2)
+
+    def test_fan_out_matches_single_partition(self):
+        from .tasks import send_chrome_notification_trigger, user_id_partitions
+        self.assertEqual(len(user_id_partitions(UserPreferences.objects.values('user_id'), 2)), 3)
+
+        result = send_chrome_notification_trigger.apply(kwargs={'partition_size': 2}).get()
+        self.assertEqual(result, 'Created 4 chrome notification triggers')
+        fanned_out = sorted(NotificationTrigger.objects.values_list('user_id', flat=True))
+
+        NotificationTrigger.objects.all().delete()
+        send_chrome_notification_trigger.apply(kwargs={'partition_size': 1000}).get()
+        self.assertEqual(sorted(NotificationTrigger.objects.values_list('user_id', flat=True)), fanned_out)
+
+    def test_fan_out_under_always_eager(self):
+        from .tasks import send_chrome_notification_trigger
+        conf = send_chrome_notification_trigger.app.conf
+        conf.task_always_eager = True
+        self.addCleanup(setattr, conf, 'task_always_eager', False)
+        result = send_chrome_notification_trigger.delay(partition_size=2)
+        self.assertEqual(result.get(), 'Created 4 chrome notification triggers')
+        self.assertEqual(NotificationTrigger.objects.count(), 4)
+
+    def test_fan_out_with_no_enabled_users(self):
+        from .tasks import send_chrome_notification_trigger
+        UserPreferences.objects.update(chrome_notifications_enabled=False)
+        self.assertEqual(send_chrome_notification_trigger(), 'Created 0 chrome notification triggers')
+
+    def test_summary_adds_up_chunk_failures(self):
+        from .tasks import summarize_chrome_notification_triggers
+        with self.assertLogs('accounts.tasks', 'INFO') as logs:
+            result = summarize_chrome_notification_triggers([
+                {'created': 3, 'failed': 0},
+                {'created': 1, 'failed': 2},
+            ])
+        self.assertEqual(result, 'Created 4 chrome notification triggers')
+        self.assertIn('2 failed, 2 chunks', logs.output[0])
+
+    def test_dispatch_triggers_users_due_by_current_minute(self):
+        from .tasks import dispatch_chrome_notification_triggers
+        UserPreferences.objects.filter(user=self.users[1]).update(chrome_notification_time=datetime.time(7, 15))
+        UserPreferences.objects.filter(user=self.users[2]).update(chrome_notification_time=datetime.time(7, 15, 30))
+        UserPreferences.objects.filter(user=self.users[0]).update(chrome_notification_time=datetime.time(7, 15))
+        UserPreferences.objects.filter(user__in=self.users[3:]).update(chrome_notification_time=datetime.time(7, 16))
+        result = dispatch_chrome_notification_triggers(bucket='07:15')
+        self.assertEqual(result, 'Dispatched 2 chrome notification triggers for 07:15')
+        self.assertEqual(
+            set(NotificationTrigger.objects.values_list('user_id', flat=True)),
+            {self.users[1].pk, self.users[2].pk},
+        )
+
+    def test_dispatch_catches_up_missed_ticks(self):
+        from .tasks import dispatch_chrome_notification_triggers
+        UserPreferences.objects.filter(user=self.users[1]).update(chrome_notification_time=datetime.time(7, 10))
+        UserPreferences.objects.filter(user=self.users[2]).update(chrome_notification_time=datetime.time(7, 15))
+        UserPreferences.objects.filter(user__in=self.users[3:]).update(chrome_notification_time=datetime.time(9, 0))
+        # The 07:10 tick ran late, as 07:15
+        self.assertEqual(
+            dispatch_chrome_notification_triggers(bucket='07:15'),
+            'Dispatched 2 chrome notification triggers for 07:15',
+        )
+        self.assertEqual(
+            dispatch_chrome_notification_triggers(bucket='07:16'),
+            'Dispatched 0 chrome notification triggers for 07:16',
+        )
+        self.assertEqual(NotificationTrigger.objects.count(), 2)
+
+    def test_dispatch_fans_out_popular_minute(self):
+        from .tasks import dispatch_chrome_notification_triggers
+        with self.assertLogs('accounts.tasks', 'INFO') as logs:
+            result = dispatch_chrome_notification_triggers.apply(kwargs={'bucket': '06:30', 'partition_size': 2}).get()
+        self.assertEqual(result, 'Dispatched 4 chrome notification triggers for 06:30')
+        self.assertIn('0 failed, 2 chunks', logs.output[-1])
+        self.assertEqual(
+            set(NotificationTrigger.objects.values_list('user_id', flat=True)),
+            {user.pk for user in self.users[1:]},
+        )
+
+    def test_dispatch_skips_times_before_the_look_back(self):
+        from .tasks import dispatch_chrome_notification_triggers
+        UserPreferences.objects.filter(user=self.users[1]).update(chrome_notification_time=datetime.time(7, 0))
+        UserPreferences.objects.filter(user=self.users[2]).update(chrome_notification_time=datetime.time(7, 1))
+        UserPreferences.objects.filter(user__in=self.users[3:]).update(chrome_notification_time=datetime.time(9, 0))
+        with self.settings(NOTIFICATION_DISPATCH_LOOKBACK=15):
+            dispatch_chrome_notification_triggers(bucket='07:15')
+        self.assertEqual(list(NotificationTrigger.objects.values_list('user_id', flat=True)), [self.users[2].pk])
+
+    def test_dispatch_last_minute_of_day(self):
+        from .tasks import dispatch_chrome_notification_triggers
+        UserPreferences.objects.filter(user=self.users[1]).update(chrome_notification_time=datetime.time(23, 59, 45))
+        dispatch_chrome_notification_triggers(bucket='23:59')
+        self.assertEqual(list(NotificationTrigger.objects.values_list('user_id', flat=True)), [self.users[1].pk])
+
+    def test_dispatch_look_back_wraps_past_midnight(self):
+        from .tasks import dispatch_chrome_notification_triggers, reminder_date
+        UserPreferences.objects.filter(user=self.users[1]).update(chrome_notification_time=datetime.time(23, 55))
+        UserPreferences.objects.filter(user=self.users[2]).update(chrome_notification_time=datetime.time(0, 2))
+        with self.settings(NOTIFICATION_DISPATCH_LOOKBACK=15):
+            result = dispatch_chrome_notification_triggers(bucket='00:05')
+        self.assertEqual(result, 'Dispatched 2 chrome notification triggers for 00:05')
+        today = reminder_date()
+        self.assertEqual(
+            dict(NotificationTrigger.objects.values_list('user_id', 'trigger_date')),
+            {self.users[1].pk: today - datetime.timedelta(days=1), self.users[2].pk: today},
+        )
+
+    def test_skips_users_who_marked_today(self):
+        from .tasks import send_chrome_notification_trigger, reminder_date
+        from my_attendance.models import Attendance
+        today = reminder_date()
+        Attendance.objects.create(user=self.users[1], date=today, day=today.day, month=today.month, is_present=True)
+        yesterday = today - datetime.timedelta(days=1)
+        Attendance.objects.create(user=self.users[2], date=yesterday, day=yesterday.day, month=yesterday.month)
+        result = send_chrome_notification_trigger()
+        self.assertEqual(result, 'Created 3 chrome notification triggers')
+        self.assertFalse(NotificationTrigger.objects.filter(user=self.users[1]).exists())
+        self.assertTrue(NotificationTrigger.objects.filter(user=self.users[2]).exists())
+
+    def test_cleanup_deletes_old_triggers_in_batches(self):
+        from .tasks import cleanup_old_notification_triggers
+        for user in self.users:
+            NotificationTrigger.objects.create(user=user)
+        old_ids = list(NotificationTrigger.objects.order_by('id').values_list('id', flat=True)[:3])
+        NotificationTrigger.objects.filter(id__in=old_ids).update(
+            created_at=timezone.now() - datetime.timedelta(days=2)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            result = cleanup_old_notification_triggers(batch_size=2, sleep=0)
+        self.assertEqual(result, 'Cleaned up 3 old notification triggers')
+        deletes = [q for q in queries if q['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 2)
+        self.assertEqual(NotificationTrigger.objects.count(), 2)
+        self.assertFalse(NotificationTrigger.objects.filter(id__in=old_ids).exists())
+
+
+class AttendanceRollupTaskTests(TestCase):
+    def setUp(self):
+        from my_attendance.models import Attendance
+        self.users = [
+            User.objects.create_user(username=f'user{i}', password='password123')
+            for i in range(3)
+        ]
+        for user, is_present in zip(self.users, [True, True, False]):
+            Attendance.objects.create(user=user, date=datetime.date(2026, 1, 5), day=5, month=1, is_present=is_present)
+        Attendance.objects.create(user=self.users[0], date=datetime.date(2026, 1, 6), day=6, month=1, is_school_off=True)
+        # Pretend every row was written long before the first run
+        Attendance.objects.update(updated_at=timezone.now() - datetime.timedelta(days=1))
+
+    def rollups(self):
+        from my_attendance.models import DailyAttendanceRollup
+        return {
+            rollup.date: (rollup.present_count, rollup.absent_count, rollup.school_off_count, rollup.total_count)
+            for rollup in DailyAttendanceRollup.objects.all()
+        }
+
+    def test_first_run_rolls_up_every_day(self):
+        from .tasks import rollup_daily_attendance
+        self.assertEqual(rollup_daily_attendance(), 'Rolled up 2 attendance days')
+        self.assertEqual(self.rollups(), {
+            datetime.date(2026, 1, 5): (2, 1, 0, 3),
+            datetime.date(2026, 1, 6): (0, 0, 1, 1),
+        })
+
+    def test_later_runs_only_recount_changed_days(self):
+        from .tasks import rollup_daily_attendance
+        from my_attendance.models import Attendance
+        rollup_daily_attendance()
+        self.assertEqual(rollup_daily_attendance(), 'Rolled up 0 attendance days')
+
+        record = Attendance.objects.get(user=self.users[2], date=datetime.date(2026, 1, 5))
+        record.is_present = True
+        record.save()
+        self.assertEqual(rollup_daily_attendance(), 'Rolled up 1 attendance days')
+        self.assertEqual(self.rollups()[datetime.date(2026, 1, 5)], (3, 0, 0, 3))
+
+    def test_full_run_drops_days_without_records(self):
+        from .tasks import rollup_daily_attendance
+        from my_attendance.models import Attendance
+        rollup_daily_attendance()
+        Attendance.objects.filter(date=datetime.date(2026, 1, 6)).delete()
+        rollup_daily_attendance(full=True)
+        self.assertEqual(list(self.rollups()), [datetime.date(2026, 1, 5)])
+
+
+@override_settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class AuthContextTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+
+    def test_settings_page_costs_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('settings'))
+        self.assertEqual(response.status_code, 200)
+        # Session from the cache; user and preferences in one JOIN
+        self.assertEqual(len(queries), 1, [q['sql'] for q in queries])
+        self.assertIn('accounts_userpreferences', queries[0]['sql'])
+
+    def test_stock_backend_sessions_are_moved_to_the_new_backends(self):
+        from django.contrib.auth import BACKEND_SESSION_KEY
+        client = Client()
+        client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = client.get(reverse('settings'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.session[BACKEND_SESSION_KEY], 'accounts.backends.ModelBackend')
+
+    async def test_stock_backend_sessions_are_moved_under_asgi(self):
+        from django.contrib.auth import BACKEND_SESSION_KEY
+        client = AsyncClient()
+        await client.aforce_login(self.user, backend='allauth.account.auth_backends.AuthenticationBackend')
+        response = await client.get(reverse('api_attendance_stats'))
+        self.assertEqual(response.status_code, 200)
+        session = await client.asession()
+        self.assertEqual(await session.aget(BACKEND_SESSION_KEY), 'accounts.backends.AuthenticationBackend')
+
+    def test_saving_a_user_does_not_query_preferences(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.user.first_name = 'New'
+            self.user.save()
+        self.assertFalse([q for q in queries if 'accounts_userpreferences' in q['sql']])
+
+    def test_missing_preferences_are_created_on_use(self):
+        UserPreferences.objects.filter(user=self.user).delete()
+        response = self.client.post(
+            reverse('update_preferences'),
+            json.dumps({'total_school_days': 200}),
+            content_type='application/json',
+        )
+        self.assertTrue(json.loads(response.content)['success'])
+        self.assertEqual(UserPreferences.objects.get(user=self.user).total_school_days, 200)
@@ -6,6 +6,8 @@ urlpatterns = [
     path('logout/', views.Logout, name='logout'),
     path('preferences/update/', views.update_preferences, name='update_preferences'),
     path('notifications/check/', views.check_notification_triggers, name='check_notification_triggers'),
+    path('notifications/stream/', views.notification_stream, name='notification_stream'),
+    path('notifications/claim/', views.claim_notification_triggers, name='claim_notification_triggers'),
     path('notifications/mark-read/', views.mark_notification_read, name='mark_notification_read'),
     path('settings/', views.settings, name='settings')
 ]
\ No newline at end of file
@@ -1,8 +1,13 @@
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth import logout
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.conf import settings as django_settings
+import json
+import time
 
 
 # Create your views here.
@@ -18,8 +23,8 @@ def Logout(request):
 
 @login_required(login_url='login')
 def settings(request):
-    from .models import UserPreferences
-    UserPreferences.objects.get_or_create(user=request.user)
+    from .models import get_user_preferences
+    get_user_preferences(request.user)
     return render(request, 'accounts/settings.html', {'user': request.user})
 
 
@@ -27,7 +32,6 @@ def settings(request):
 def update_preferences(request):
     if request.method == 'POST':
         try:
-            import json
             # Handle both JSON and form data
             if request.content_type == 'application/json':
                 data = json.loads(request.body)
@@ -40,8 +44,8 @@ def update_preferences(request):
                 school_days = request.POST.get('total_school_days')
             
             # Ensure preferences exist
-            from .models import UserPreferences
-            prefs, created = UserPreferences.objects.get_or_create(user=request.user)
+            from .models import get_user_preferences
+            prefs = get_user_preferences(request.user)
             
             if chrome_time:
                 prefs.chrome_notification_time = chrome_time
@@ -77,28 +81,137 @@ def check_notification_triggers(request):
         'count': len(triggers)
     })
 
+@login_required
+async def acheck_notification_triggers(request):
+    """
+    Async check_notification_triggers, routed under ASGI so that polling
+    clients don't each hold a worker thread while the query runs.
+    """
+    from .models import NotificationTrigger
+    
+    user = await request.auser()
+    triggers = [
+        trigger
+        async for trigger in NotificationTrigger.objects.filter(
+            user=user,
+            is_read=False
+        ).values('id', 'notification_type', 'created_at')
+    ]
+    
+    return JsonResponse({
+        'success': True,
+        'triggers': triggers,
+        'count': len(triggers)
+    })
+
+@login_required
+def claim_notification_triggers(request):
+    """
+    Return the user's pending notification triggers and mark them read in
+    the same transaction. Rows being claimed by another tab are skipped, so
+    each reminder is shown exactly once even with several tabs open.
+    """
+    if request.method == 'POST':
+        from .models import NotificationTrigger
+        
+        with transaction.atomic():
+            triggers = list(NotificationTrigger.objects.select_for_update(skip_locked=True).filter(
+                user=request.user,
+                is_read=False
+            ).values('id', 'notification_type', 'created_at'))
+            
+            if triggers:
+                NotificationTrigger.objects.filter(
+                    id__in=[trigger['id'] for trigger in triggers]
+                ).update(is_read=True)
+        
+        return JsonResponse({
+            'success': True,
+            'triggers': triggers,
+            'count': len(triggers)
+        })
+    return JsonResponse({'success': False, 'message': 'Invalid request method.'})
+
+def sse_message(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@login_required
+async def notification_stream(request):
+    """
+    Server-Sent Events stream of notification triggers for the current user.
+    Pending triggers are sent on connect, then new ones are pushed as they are
+    created. Only available under ASGI; the frontend polls otherwise.
+    """
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be tied up for the life of the stream
+        return JsonResponse({'success': False, 'message': 'Streaming requires ASGI.'}, status=503)
+
+    from .events import get_event_bus
+    from .models import NotificationTrigger
+
+    user = await request.auser()
+    bus = get_event_bus()
+
+    async def events():
+        subscription = bus.subscribe(user.pk)
+        try:
+            # Subscribe before reading pending triggers, so none created in between is missed
+            await subscription.start()
+
+            # Tell the browser how long to wait before reconnecting
+            yield "retry: 5000\n\n"
+
+            pending = [
+                {**trigger, 'created_at': trigger['created_at'].isoformat()}
+                async for trigger in NotificationTrigger.objects.filter(
+                    user=user,
+                    is_read=False
+                ).values('id', 'notification_type', 'created_at')
+            ]
+            for trigger in pending:
+                yield sse_message('trigger', trigger)
+            # A trigger created during that read is also pushed; send it once
+            sent = {trigger['id'] for trigger in pending}
+
+            deadline = time.monotonic() + django_settings.NOTIFICATION_STREAM_MAX_AGE
+            while time.monotonic() < deadline:
+                event = await subscription.get(timeout=django_settings.NOTIFICATION_STREAM_HEARTBEAT)
+                if event is None:
+                    yield ": keep-alive\n\n"
+                elif event['id'] not in sent:
+                    yield sse_message('trigger', event)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 def mark_notification_read(request):
     """
-    Mark a notification trigger as read.
+    Mark notification triggers as read.
+    Accepts a single ``trigger_id`` or a list of ``trigger_ids``; either way
+    it is one UPDATE, with no fetch of the rows first.
     """
     if request.method == 'POST':
         try:
-            import json
             data = json.loads(request.body)
-            trigger_id = data.get('trigger_id')
+            trigger_ids = data.get('trigger_ids')
+            if trigger_ids is None:
+                trigger_ids = [data.get('trigger_id')]
             
             from .models import NotificationTrigger
-            trigger = NotificationTrigger.objects.get(
-                id=trigger_id,
+            updated = NotificationTrigger.objects.filter(
+                id__in=trigger_ids,
                 user=request.user
-            )
-            trigger.is_read = True
-            trigger.save()
+            ).update(is_read=True)
             
-            return JsonResponse({'success': True, 'message': 'Notification marked as read.'})
-        except NotificationTrigger.DoesNotExist:
-            return JsonResponse({'success': False, 'message': 'Notification not found.'})
+            if not updated:
+                return JsonResponse({'success': False, 'message': 'Notification not found.'})
+            return JsonResponse({'success': True, 'message': 'Notification marked as read.', 'count': updated})
         except Exception as e:
             return JsonResponse({'success': False, 'message': str(e)})
     return JsonResponse({'success': False, 'message': 'Invalid request method.'})
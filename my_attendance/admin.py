@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Attendance
+from .models import Attendance, AttendanceSummary, DailyAttendanceRollup
 
 # Register your models here.
-admin.site.register(Attendance)
\ No newline at end of file
+admin.site.register(Attendance)
+admin.site.register(AttendanceSummary)
+admin.site.register(DailyAttendanceRollup)
\ No newline at end of file
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class MyAttendanceConfig(AppConfig):
     name = 'my_attendance'
+
+    def ready(self):
+        from . import checks  # noqa: F401
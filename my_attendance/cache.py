@@ -0,0 +1,57 @@
+"""
+Per-user attendance version numbers for cache keys.
+
+Every cached value derived from a user's attendance (stats, ETags, the
+history fragment) includes the user's current version in its key. Writes
+bump the version after they commit, so the next read misses and nothing
+stale is ever served; old entries simply expire.
+
+That only holds when every process that writes attendance shares the cache:
+the default locmem cache is per process, so production uses Redis (see
+production_settings and the my_attendance deploy checks).
+"""
+import time
+from django.core.cache import cache
+
+
+def version_key(user_id):
+    return f'attendance:version:{user_id}'
+
+
+def get_attendance_version(user_id):
+    """
+    Return the user's current attendance version, starting one if needed.
+    A fresh version is a nanosecond timestamp, so it never repeats a value
+    used before the key was evicted.
+    """
+    version = cache.get(version_key(user_id))
+    if version is None:
+        cache.add(version_key(user_id), time.time_ns(), timeout=None)
+        version = cache.get(version_key(user_id))
+    return version
+
+
+async def aget_attendance_version(user_id):
+    """
+    Async get_attendance_version(), for views served under ASGI.
+    """
+    version = await cache.aget(version_key(user_id))
+    if version is None:
+        await cache.aadd(version_key(user_id), time.time_ns(), timeout=None)
+        version = await cache.aget(version_key(user_id))
+    return version
+
+
+def bump_attendance_version(user_id):
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        # Not cached (never read, or evicted): the next read starts a new version
+        pass
+
+
+def invalidate_attendance_versions(user_ids):
+    """
+    Drop the versions of many users at once, e.g. after rebuilding summaries.
+    """
+    cache.delete_many([version_key(user_id) for user_id in user_ids])
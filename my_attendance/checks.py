@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+
+# Backends whose entries are only visible to the process that wrote them
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+DATABASE_CACHE = 'django.core.cache.backends.db.DatabaseCache'
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Attendance versions live in the default cache. With a per-process
+    backend, writes from another web worker, Celery or a management command
+    don't invalidate this process's cached stats, ETags and history. The
+    database cache is shared, but each hit is a query of its own.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f'The default cache ({backend}) is not shared between processes, so '
+            'attendance written by one process is served stale by the others.',
+            hint='Use Redis (see production_settings) or memcached.',
+            id='my_attendance.E001',
+        )]
+    if backend == DATABASE_CACHE:
+        return [Warning(
+            'The default cache is the database cache, so every version, stats '
+            'and ETag lookup is a database query.',
+            hint='Use Redis (see production_settings) or memcached.',
+            id='my_attendance.W001',
+        )]
+    return []
+
+
+@register(Tags.caches, deploy=True)
+def check_session_cache(app_configs, **kwargs):
+    """
+    cached_db sessions only save queries when their cache isn't the
+    database: on the database cache every session read is still a query
+    and every write goes to both tables.
+    """
+    if settings.SESSION_ENGINE != 'django.contrib.sessions.backends.cached_db':
+        return []
+    backend = settings.CACHES.get(settings.SESSION_CACHE_ALIAS, {}).get('BACKEND')
+    if backend == DATABASE_CACHE:
+        return [Warning(
+            'cached_db sessions are cached in the database cache, so each session '
+            'read is still a query and each write goes to two tables.',
+            hint="Use Redis for SESSION_CACHE_ALIAS or the 'db' session engine.",
+            id='my_attendance.W002',
+        )]
+    return []
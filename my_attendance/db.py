@@ -0,0 +1,45 @@
+from django.db import connection
+from django.db.migrations.operations import AddIndex
+
+
+def upsert_options(unique_fields, update_fields):
+    """
+    bulk_create() kwargs for an upsert that work on every backend we run on.
+    MySQL resolves conflicts on any unique key (ON DUPLICATE KEY UPDATE) and
+    rejects unique_fields, while SQLite and PostgreSQL require them.
+    """
+    options = {
+        'update_conflicts': True,
+        'update_fields': update_fields,
+    }
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = unique_fields
+    return options
+
+
+class AddIndexOnline(AddIndex):
+    """
+    AddIndex that builds the index without blocking reads or writes on
+    MySQL (ALGORITHM=INPLACE, LOCK=NONE), so it can ship on a large table
+    without downtime. Other backends run a plain CREATE INDEX.
+    """
+    online_ddl = ' ALGORITHM=INPLACE LOCK=NONE'
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if schema_editor.connection.vendor != 'mysql':
+            return super().database_forwards(app_label, schema_editor, from_state, to_state)
+        schema_editor.execute(str(self.index.create_sql(model, schema_editor)) + self.online_ddl)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self.allow_migrate_model(schema_editor.connection.alias, model):
+            return
+        if schema_editor.connection.vendor != 'mysql':
+            return super().database_backwards(app_label, schema_editor, from_state, to_state)
+        schema_editor.execute(str(self.index.remove_sql(model, schema_editor)) + self.online_ddl)
+
+    def describe(self):
+        return f'{super().describe()} (online)'
@@ -0,0 +1,42 @@
+import csv
+from .stats import status_of
+
+# Rows fetched per round trip while streaming an export
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_HEADER = ['Date', 'Day', 'Month', 'Year', 'Status']
+STATUS_LABELS = {
+    'present': 'Present',
+    'absent': 'Absent',
+    'school_off': 'School Off',
+}
+
+
+class Echo:
+    """
+    File-like object whose write() returns the line, so csv.writer can
+    produce rows for a generator instead of a buffer.
+    """
+    def write(self, value):
+        return value
+
+
+def attendance_csv_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the CSV export of ``queryset`` line by line, oldest first.
+
+    Records are read with .iterator() so only one chunk is held in memory,
+    however many years of history are exported.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADER)
+
+    records = queryset.order_by('date').only('date', 'day', 'month', 'is_present', 'is_school_off')
+    for record in records.iterator(chunk_size=chunk_size):
+        yield writer.writerow([
+            record.date.isoformat(),
+            record.day,
+            record.month,
+            record.date.year,
+            STATUS_LABELS[status_of(record)],
+        ])
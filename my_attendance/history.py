@@ -0,0 +1,82 @@
+from datetime import datetime
+from django.utils.functional import cached_property
+
+# Rows per page for the dashboard table and the history API
+HISTORY_PAGE_SIZE = 30
+MAX_HISTORY_PAGE_SIZE = 100
+
+
+def parse_date(value):
+    """
+    Parse a 'YYYY-MM-DD' string, returning None if it is missing or invalid
+    (including values that are not strings, e.g. numbers from a JSON body).
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def filter_by_date_range(queryset, params):
+    """
+    Apply the dashboard's start_date/end_date filters from ``params``.
+
+    Invalid dates are ignored. Returns (queryset, filters), where filters
+    holds the raw values that were applied, for echoing back to the page.
+    """
+    filters = {}
+    start_date = parse_date(params.get('start_date'))
+    if start_date:
+        queryset = queryset.filter(date__gte=start_date)
+        filters['start_date'] = params['start_date']
+
+    end_date = parse_date(params.get('end_date'))
+    if end_date:
+        queryset = queryset.filter(date__lte=end_date)
+        filters['end_date'] = params['end_date']
+    return queryset, filters
+
+
+def history_page(queryset, before=None, limit=HISTORY_PAGE_SIZE):
+    """
+    Return one keyset page of attendance records, newest first.
+
+    Pages are addressed by the last date seen (``before``) instead of an
+    OFFSET, so every page is an index range scan on (user, date) no matter
+    how deep into the history it is. Returns (records, next_before), where
+    next_before is None on the last page.
+    """
+    if before:
+        queryset = queryset.filter(date__lt=before)
+
+    # Fetch one extra row to know whether an older page exists
+    records = list(queryset.order_by('-date')[:limit + 1])
+    if len(records) > limit:
+        records = records[:limit]
+        return records, records[-1].date
+    return records, None
+
+
+class HistoryPage:
+    """
+    A history_page() that only runs its query when the records are first
+    read, so a template whose history fragment is cached never queries.
+    """
+    def __init__(self, queryset, before=None, limit=HISTORY_PAGE_SIZE):
+        self.queryset = queryset
+        self.before = before
+        self.limit = limit
+
+    @cached_property
+    def page(self):
+        return history_page(self.queryset, before=self.before, limit=self.limit)
+
+    @property
+    def records(self):
+        return self.page[0]
+
+    @property
+    def next_before(self):
+        return self.page[1]
@@ -0,0 +1,136 @@
+"""
+CSV import of attendance records.
+
+Rows are parsed one at a time and written in batches: each batch is one
+upsert on the (user, date) key across all its users, committed on its own,
+so importing tens of thousands of rows takes a few queries per batch
+(plus one summary UPDATE per user) instead of one request per row.
+"""
+import csv
+from contextlib import nullcontext
+from django.contrib.auth.models import User
+from django.db import transaction
+from .history import parse_date
+from .marking import STATUS_FLAGS, write_attendance_many
+
+# Valid rows collected before they are written
+IMPORT_BATCH_SIZE = 1000
+
+# Errors kept for the report; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportResult:
+    """
+    Counts and error report of one import.
+    """
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.created = 0
+        self.updated = 0
+        self.error_count = 0
+        self.errors = []
+
+    @property
+    def imported(self):
+        return self.created + self.updated
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'message': message})
+
+    def as_dict(self):
+        return {
+            'dry_run': self.dry_run,
+            'imported': self.imported,
+            'created': self.created,
+            'updated': self.updated,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+
+def parse_status(value):
+    """
+    Accept 'present', 'absent', 'school_off' and the export's labels
+    ('Present', 'School Off', ...). Returns None for anything else.
+    """
+    status = (value or '').strip().lower().replace(' ', '_')
+    return status if status in STATUS_FLAGS else None
+
+
+def import_attendance(lines, user=None, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import attendance from CSV ``lines`` (any iterable of strings).
+
+    The header needs 'date' and 'status' columns, so a file produced by
+    the CSV export can be imported as is. Without ``user``, a 'username'
+    column says whose record each row is. Invalid rows are skipped and
+    reported. Each batch commits on its own, so users' summary rows are
+    only locked while their batch is written. With ``dry_run`` the import
+    runs in full in one transaction and is rolled back.
+    """
+    result = ImportResult(dry_run)
+    reader = csv.DictReader(lines)
+    columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+
+    required = ['date', 'status'] if user else ['username', 'date', 'status']
+    missing = [name for name in required if name not in columns]
+    if missing:
+        result.add_error(1, f"Missing column{'s' if len(missing) > 1 else ''}: {', '.join(missing)}.")
+        return result
+
+    users = {}
+    with transaction.atomic() if dry_run else nullcontext():
+        batch = []
+        for row in reader:
+            target_date = parse_date((row[columns['date']] or '').strip())
+            if target_date is None:
+                result.add_error(reader.line_num, 'Invalid date, expected YYYY-MM-DD.')
+                continue
+            status = parse_status(row[columns['status']])
+            if status is None:
+                result.add_error(reader.line_num, 'Invalid status, expected present, absent or school_off.')
+                continue
+            username = None if user else (row[columns['username']] or '').strip()
+
+            batch.append((reader.line_num, username, target_date, status))
+            if len(batch) >= batch_size:
+                write_batch(batch, user, users, result)
+                batch = []
+        if batch:
+            write_batch(batch, user, users, result)
+
+        if dry_run:
+            transaction.set_rollback(True)
+    return result
+
+
+def write_batch(batch, user, users, result):
+    """
+    Write one batch of parsed rows with a single upsert in its own
+    transaction. ``users`` maps usernames already looked up to their User
+    (or None if unknown).
+    """
+    if user is None:
+        unknown = {username for _, username, _, _ in batch} - users.keys()
+        if unknown:
+            users.update(dict.fromkeys(unknown))
+            users.update({found.username: found for found in User.objects.filter(username__in=unknown)})
+
+    by_user = {}
+    for line, username, target_date, status in batch:
+        owner = user or users[username]
+        if owner is None:
+            result.add_error(line, f'Unknown user "{username}".')
+            continue
+        # A later row for the same date wins, as it would in the spreadsheet
+        by_user.setdefault(owner, {})[target_date] = status
+    if not by_user:
+        return
+
+    existing = write_attendance_many(by_user)
+    for owner, statuses in by_user.items():
+        result.updated += len(existing[owner.pk])
+        result.created += len(statuses) - len(existing[owner.pk])
@@ -0,0 +1,162 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from accounts.models import NotificationTrigger, UserPreferences
+from accounts.tasks import cleanup_old_notification_triggers, create_chrome_notification_trigger_chunk
+from my_attendance.models import Attendance
+from my_attendance.stats import rebuild_attendance_summaries
+
+
+class Command(BaseCommand):
+    help = 'Seed synthetic attendance data and time the hot views and tasks (SQLite-friendly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100, help='Users to seed (default: 100)')
+        parser.add_argument('--days', type=int, default=180, help='Days of attendance per user (default: 180)')
+        parser.add_argument('--requests', type=int, default=50, help='Requests timed per view (default: 50)')
+        parser.add_argument('--task-runs', type=int, default=3, help='Runs timed per Celery task (default: 3)')
+        parser.add_argument('--clients', type=int, default=10, help='Logged-in users the requests rotate over (default: 10)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic data')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded data instead of deleting it')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        prefix = f'bench_{int(time.time())}_'
+
+        # The timed requests run in autocommit like production ones do, so
+        # on_commit hooks (cache version bumps, trigger events) fire and the
+        # commit is part of each timing. The seeded users are deleted at the
+        # end instead, which cascades to everything created for them
+        try:
+            users = self.seed(prefix, options['users'], options['days'])
+            self.benchmark(users, options)
+        finally:
+            if not options['keep']:
+                deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+                self.stdout.write(f'🧹 Deleted {deleted} seeded rows (use --keep to keep them)')
+
+    @transaction.atomic
+    def seed(self, prefix, user_count, days):
+        started = time.perf_counter()
+
+        # bulk_create skips the post_save signal, so preferences are inserted here too
+        User.objects.bulk_create(
+            [User(username=f'{prefix}{i}', password='!') for i in range(user_count)],
+            batch_size=1000,
+        )
+        users = list(User.objects.filter(username__startswith=prefix).order_by('pk'))
+        UserPreferences.objects.bulk_create(
+            [UserPreferences(user=user) for user in users],
+            batch_size=1000,
+        )
+
+        first_day = date.today() - timedelta(days=days)
+        records = []
+        for user in users:
+            for offset in range(days):
+                target_date = first_day + timedelta(days=offset)
+                roll = self.random.random()
+                records.append(Attendance(
+                    user=user,
+                    date=target_date,
+                    day=target_date.day,
+                    month=target_date.month,
+                    is_present=roll < 0.75,
+                    is_school_off=roll > 0.9,
+                ))
+            if len(records) >= 10000:
+                Attendance.objects.bulk_create(records, batch_size=1000)
+                records = []
+        Attendance.objects.bulk_create(records, batch_size=1000)
+
+        NotificationTrigger.objects.bulk_create(
+            [NotificationTrigger(user=user) for user in users],
+            batch_size=1000,
+        )
+
+        user_ids = [user.pk for user in users]
+        for index in range(0, len(user_ids), 500):
+            rebuild_attendance_summaries(user_ids[index:index + 500])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'🌱 Seeded {len(users)} users x {days} days '
+            f'({len(users) * days} attendance rows) in {time.perf_counter() - started:.1f}s'
+        ))
+        return users
+
+    def benchmark(self, users, options):
+        clients = []
+        for user in users[:options['clients']]:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+
+        def mark(client):
+            target_date = date.today() - timedelta(days=self.random.randrange(options['days']))
+            status = self.random.choice(['present', 'absent', 'school_off'])
+            return client.post(reverse('mark_attendance'), {'status': status, 'date': str(target_date)})
+
+        views = [
+            ('home', lambda client: client.get(reverse('home'))),
+            ('mark_attendance', mark),
+            ('get_attendance_stats', lambda client: client.get(reverse('api_attendance_stats'))),
+            ('check_notification_triggers', lambda client: client.get(reverse('check_notification_triggers'))),
+        ]
+
+        self.stdout.write(f"\n{'target':<48}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>10}")
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, request in views:
+                timings, queries = [], []
+                for index in range(options['requests']):
+                    client = clients[index % len(clients)]
+                    with CaptureQueriesContext(connection) as captured:
+                        started = time.perf_counter()
+                        response = request(client)
+                        timings.append(time.perf_counter() - started)
+                    queries.append(len(captured))
+                    if response.status_code != 200:
+                        self.stdout.write(self.style.ERROR(f'❌ {name} returned {response.status_code}'))
+                        break
+                self.report(name, timings, queries)
+
+        for client in clients:
+            client.logout()
+
+        # apply() runs the task in-process, as CELERY_TASK_ALWAYS_EAGER would; no broker needed.
+        # The reminder chunk is limited to the seeded id range so no real user is reminded
+        seeded_ids = {'start_id': users[0].pk, 'end_id': users[-1].pk + 1}
+        tasks = [
+            ('create_chrome_notification_trigger_chunk', create_chrome_notification_trigger_chunk, seeded_ids),
+            ('cleanup_old_notification_triggers', cleanup_old_notification_triggers, {}),
+        ]
+        for name, task, kwargs in tasks:
+            timings, queries = [], []
+            for _ in range(options['task_runs']):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    task.apply(kwargs=kwargs).get()
+                    timings.append(time.perf_counter() - started)
+                queries.append(len(captured))
+            self.report(f'task {name}', timings, queries)
+
+    def report(self, name, timings, queries):
+        if not timings:
+            return
+        if len(timings) > 1:
+            cuts = statistics.quantiles(timings, n=100, method='inclusive')
+            p50, p95, p99 = cuts[49], cuts[94], cuts[98]
+        else:
+            p50 = p95 = p99 = timings[0]
+        self.stdout.write(
+            f'{name:<48}{p50 * 1000:>10.1f}{p95 * 1000:>10.1f}{p99 * 1000:>10.1f}'
+            f'{statistics.mean(queries):>10.1f}'
+        )
@@ -0,0 +1,121 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+# The endpoints the dashboard and the notification script poll
+POLLED_ENDPOINTS = [
+    '/api/attendance/today/',
+    '/api/attendance/stats/',
+    '/notifications/check/',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Poll the JSON endpoints of a running server from many concurrent clients and report '
+        'requests/sec and latency percentiles. Run it once against the WSGI server and once '
+        'against the ASGI server (e.g. gunicorn AttendanceManager.wsgi vs '
+        'uvicorn AttendanceManager.asgi:application) to compare them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to poll (default: http://127.0.0.1:8000)')
+        parser.add_argument('--label', default='', help='Name printed with the results, e.g. WSGI or ASGI')
+        parser.add_argument('--clients', type=int, default=50, help='Concurrent polling clients (default: 50)')
+        parser.add_argument('--duration', type=float, default=15, help='Seconds to poll for (default: 15)')
+        parser.add_argument('--username', help='Poll as this existing user (default: a temporary user)')
+        parser.add_argument('--timeout', type=float, default=10, help='Per-request timeout in seconds (default: 10)')
+
+    def handle(self, *args, **options):
+        if options['username']:
+            user = User.objects.get(username=options['username'])
+            temporary = False
+        else:
+            user = User.objects.create_user(username=f'bench_polling_{int(time.time())}')
+            temporary = True
+
+        session = self.create_session(user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+        base_url = options['base_url'].rstrip('/')
+
+        try:
+            results = self.poll(base_url, cookie, options)
+        finally:
+            session.delete()
+            if temporary:
+                user.delete()
+
+        label = f" [{options['label']}]" if options['label'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"📡 {options['clients']} clients polling {base_url} for {options['duration']:g}s{label}"
+        ))
+        self.stdout.write(f"\n{'endpoint':<32}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>10}")
+        for endpoint in POLLED_ENDPOINTS:
+            self.report(endpoint, results[endpoint], options['duration'])
+        self.report('all', [sample for samples in results.values() for sample in samples], options['duration'])
+
+    def create_session(self, user):
+        """
+        A logged-in session for ``user``, stored where the server will read it.
+        """
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session
+
+    def poll(self, base_url, cookie, options):
+        """
+        Run the clients until the deadline. Returns {endpoint: [(seconds, ok)]}.
+        """
+        results = {endpoint: [] for endpoint in POLLED_ENDPOINTS}
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['duration']
+
+        def client(offset):
+            samples = {endpoint: [] for endpoint in POLLED_ENDPOINTS}
+            index = offset
+            while time.monotonic() < deadline:
+                endpoint = POLLED_ENDPOINTS[index % len(POLLED_ENDPOINTS)]
+                index += 1
+                request = Request(base_url + endpoint, headers={'Cookie': cookie, 'Accept': 'application/json'})
+                started = time.perf_counter()
+                try:
+                    with urlopen(request, timeout=options['timeout']) as response:
+                        response.read()
+                        # A redirect to the login page means the session was rejected
+                        ok = response.status == 200 and response.geturl() == request.full_url
+                except (HTTPError, URLError, OSError):
+                    ok = False
+                samples[endpoint].append((time.perf_counter() - started, ok))
+            with lock:
+                for endpoint, values in samples.items():
+                    results[endpoint].extend(values)
+
+        with ThreadPoolExecutor(max_workers=options['clients']) as executor:
+            list(executor.map(client, range(options['clients'])))
+        return results
+
+    def report(self, name, samples, duration):
+        timings = [seconds for seconds, ok in samples if ok]
+        errors = len(samples) - len(timings)
+        if len(timings) > 1:
+            cuts = statistics.quantiles(timings, n=100, method='inclusive')
+            p50, p99 = cuts[49], cuts[98]
+        elif timings:
+            p50 = p99 = timings[0]
+        else:
+            p50 = p99 = 0
+        self.stdout.write(
+            f'{name:<32}{len(samples):>10}{len(timings) / duration:>10.1f}'
+            f'{p50 * 1000:>10.1f}{p99 * 1000:>10.1f}{errors:>10}'
+        )
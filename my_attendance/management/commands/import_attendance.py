@@ -0,0 +1,50 @@
+import sys
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from my_attendance.importer import IMPORT_BATCH_SIZE, import_attendance
+
+
+class Command(BaseCommand):
+    help = 'Import attendance records from a CSV file (columns: username, date, status)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import, or - for stdin')
+        parser.add_argument('--user', help='Import every row for this username (no username column needed)')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and count without saving anything')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help=f'Rows written per batch (default: {IMPORT_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'User "{options["user"]}" does not exist')
+
+        if options['path'] == '-':
+            result = self.run(sys.stdin, user, options)
+        else:
+            try:
+                with open(options['path'], newline='', encoding='utf-8-sig') as csv_file:
+                    result = self.run(csv_file, user, options)
+            except OSError as exc:
+                raise CommandError(f'Cannot read {options["path"]}: {exc}')
+
+        for error in result.errors:
+            self.stdout.write(self.style.WARNING(f'⚠️  Line {error["line"]}: {error["message"]}'))
+        if result.error_count > len(result.errors):
+            self.stdout.write(self.style.WARNING(f'⚠️  ...and {result.error_count - len(result.errors)} more errors'))
+
+        summary = f'{result.imported} records ({result.created} created, {result.updated} updated), {result.error_count} rows skipped'
+        if result.dry_run:
+            self.stdout.write(self.style.SUCCESS(f'🔍 Dry run: would import {summary}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✅ Imported {summary}'))
+
+    def run(self, lines, user, options):
+        return import_attendance(lines, user=user, dry_run=options['dry_run'], batch_size=options['batch_size'])
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from my_attendance.stats import rebuild_attendance_summaries
+
+
+class Command(BaseCommand):
+    help = 'Rebuild every user\'s AttendanceSummary counters from their Attendance rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of users rebuilt per query (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+
+        total = 0
+        batch = []
+        for user_id in user_ids.iterator(chunk_size=batch_size):
+            batch.append(user_id)
+            if len(batch) >= batch_size:
+                rebuild_attendance_summaries(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            rebuild_attendance_summaries(batch)
+            total += len(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Reconciled attendance summaries for {total} users')
+        )
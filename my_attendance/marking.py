@@ -0,0 +1,86 @@
+from datetime import timedelta
+from django.db import transaction
+from .db import upsert_options
+from .models import Attendance
+from .stats import lock_attendance_summaries, record_status_changes, status_of
+
+# Attendance flags stored for each status
+STATUS_FLAGS = {
+    'present': {'is_present': True, 'is_school_off': False},
+    'absent': {'is_present': False, 'is_school_off': False},
+    'school_off': {'is_present': False, 'is_school_off': True},
+}
+
+# Upper bound on dates written by one bulk request (a full year)
+MAX_BULK_DATES = 366
+
+
+def date_range(start_date, end_date):
+    """
+    Every date from start_date to end_date, inclusive.
+    """
+    return [start_date + timedelta(days=offset) for offset in range((end_date - start_date).days + 1)]
+
+
+def write_attendance(user, statuses):
+    """
+    Upsert a {date: status} mapping for one user in one transaction.
+    Returns the previous status of the dates that already had a record.
+    """
+    return write_attendance_many({user: statuses})[user.pk]
+
+
+def write_attendance_many(statuses_by_user):
+    """
+    Upsert {user: {date: status}} for any number of users in one transaction.
+
+    Existing rows are read with one query (to report created/updated and
+    to adjust the summaries), then every row is written with a single
+    batched upsert on the (user, date) unique key; only the summary
+    counters are updated per user. Returns {user_id: {date: previous
+    status}} for the dates that already had a record.
+    """
+    requested = {user.pk: statuses for user, statuses in statuses_by_user.items()}
+    dates = {target_date for statuses in requested.values() for target_date in statuses}
+
+    with transaction.atomic():
+        # Serialise each user's writes so the created/updated split is exact
+        lock_attendance_summaries(requested)
+        existing = {user_id: {} for user_id in requested}
+        # Users x dates may over-select when several users are written; keep the requested pairs
+        for record in Attendance.objects.filter(user_id__in=list(requested), date__in=dates):
+            if record.date in requested[record.user_id]:
+                existing[record.user_id][record.date] = status_of(record)
+
+        Attendance.objects.bulk_create(
+            [
+                Attendance(user=user, date=target_date, day=target_date.day, month=target_date.month, **STATUS_FLAGS[status])
+                for user, statuses in statuses_by_user.items()
+                for target_date, status in statuses.items()
+            ],
+            **upsert_options(unique_fields=['user', 'date'], update_fields=['is_present', 'is_school_off', 'updated_at']),
+        )
+
+        for user, statuses in statuses_by_user.items():
+            previous = existing[user.pk]
+            record_status_changes(user, [(previous.get(target_date), status) for target_date, status in statuses.items()])
+
+    return existing
+
+
+def bulk_mark_attendance(user, dates, status):
+    """
+    Mark many dates with the same status in one transaction. Returns a
+    list of {'date', 'created'} dicts in date order.
+    """
+    dates = sorted(set(dates))
+    existing = write_attendance(user, {target_date: status for target_date in dates})
+    return [{'date': str(target_date), 'created': target_date not in existing} for target_date in dates]
+
+
+def mark_attendance_for_date(user, target_date, status):
+    """
+    Mark a single date. Safe to call concurrently for the same date: the
+    upsert never hits the unique constraint. Returns True if the row was created.
+    """
+    return bulk_mark_attendance(user, [target_date], status)[0]['created']
@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from datetime import date
 
 # Create your models here.
@@ -16,9 +18,78 @@ class Attendance(models.Model):
 
     is_school_off = models.BooleanField(default=False, null=True)
 
+    # Lets the nightly rollup find the days that changed since its last run
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
+        # Also serves newest-first history pages (user = ? ORDER BY date DESC),
+        # read backwards, so no separate (user, -date) index is needed
         unique_together = ('user', 'date')
+        indexes = [
+            # The rollup reads changed rows, then recounts whole days
+            models.Index(fields=['updated_at'], name='attendance_updated_idx'),
+            models.Index(fields=['date'], name='attendance_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.first_name} - {self.date}"
-    
\ No newline at end of file
+    
+class AttendanceSummary(models.Model):
+    """
+    Per-user attendance counters, kept in step with Attendance rows by
+    mark_attendance so the dashboard reads one row instead of all history.
+    Rebuild with the reconcile_attendance_summaries command if it drifts.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='attendance_summary')
+
+    present_count = models.IntegerField(default=0)
+
+    absent_count = models.IntegerField(default=0)
+
+    school_off_count = models.IntegerField(default=0)
+
+    total_count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user.username}'s attendance summary"
+
+
+class DailyAttendanceRollup(models.Model):
+    """
+    Site-wide counters for one date, rebuilt by the nightly
+    rollup_daily_attendance task for the days that changed since its last
+    run. The staff dashboard reads these instead of scanning Attendance.
+    """
+    date = models.DateField(unique=True)
+
+    present_count = models.IntegerField(default=0)
+
+    absent_count = models.IntegerField(default=0)
+
+    school_off_count = models.IntegerField(default=0)
+
+    total_count = models.IntegerField(default=0)
+
+    # Start of the run that wrote this row; the latest one is the next run's watermark
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"Attendance rollup for {self.date}"
+
+
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def rebuild_summary_on_direct_change(sender, instance, **kwargs):
+    # Edits outside mark_attendance (admin, shell) bypass the summary counters;
+    # rebuilding also invalidates the user's cached stats
+    origin = kwargs.get('origin', instance)
+    origin_model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    if origin_model is not Attendance:
+        return  # cascade from deleting the user; their summary goes with them
+    from .stats import rebuild_attendance_summaries
+    rebuild_attendance_summaries([instance.user_id])
@@ -0,0 +1,312 @@
+from asgiref.sync import sync_to_async
+from collections import Counter
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Max, Q, Value, When
+from .cache import aget_attendance_version, bump_attendance_version, get_attendance_version, invalidate_attendance_versions
+from .db import upsert_options
+from .models import Attendance, AttendanceSummary, DailyAttendanceRollup
+
+# Counter column on AttendanceSummary for each attendance status
+SUMMARY_FIELDS = {
+    'present': 'present_count',
+    'absent': 'absent_count',
+    'school_off': 'school_off_count',
+}
+
+
+def status_of(attendance):
+    """
+    Return the status string ('present', 'absent', 'school_off') of a record.
+    """
+    if attendance.is_school_off:
+        return 'school_off'
+    if attendance.is_present:
+        return 'present'
+    return 'absent'
+
+# Per-day codes in the breakdown heatmap array (0 = nothing recorded)
+HEATMAP_CODES = {
+    'present': 1,
+    'absent': 2,
+    'school_off': 3,
+}
+
+
+def stats_aggregates():
+    """
+    Conditional aggregates for every counter, usable with aggregate() or annotate().
+    """
+    return {
+        'total': Count('id'),
+        'present': Count('id', filter=Q(is_present=True)),
+        # Absent is when not present AND not school off
+        'absent': Count('id', filter=Q(is_present=False, is_school_off=False)),
+        'school_off': Count('id', filter=Q(is_school_off=True)),
+    }
+
+
+def compute_attendance_stats(user):
+    """
+    Compute all attendance counters for a user in a single query.
+    Uses conditional aggregation so total/present/absent/school_off
+    come back from one round-trip instead of one COUNT each.
+    """
+    counts = Attendance.objects.filter(user=user).aggregate(**stats_aggregates())
+    return build_stats(**counts)
+
+
+def attendance_breakdown(user, year):
+    """
+    Per-month counters and a per-day heatmap array for one calendar year.
+
+    One GROUP BY on the stored month/day columns returns a status code per
+    recorded day; the month totals are summed from those rows. ``days`` has
+    one code per day of the year (HEATMAP_CODES, 0 for no record).
+    """
+    status_code = Case(
+        When(is_school_off=True, then=Value(HEATMAP_CODES['school_off'])),
+        When(is_present=True, then=Value(HEATMAP_CODES['present'])),
+        default=Value(HEATMAP_CODES['absent']),
+        output_field=IntegerField(),
+    )
+    rows = (
+        Attendance.objects
+        .filter(user=user, date__year=year)
+        .values_list('month', 'day')
+        .annotate(code=Max(status_code))
+        .order_by()
+    )
+
+    first_day = date(year, 1, 1)
+    days = [0] * ((date(year, 12, 31) - first_day).days + 1)
+    months = [
+        {'month': month, 'present': 0, 'absent': 0, 'school_off': 0, 'total': 0}
+        for month in range(1, 13)
+    ]
+    statuses = {code: status for status, code in HEATMAP_CODES.items()}
+    for month, day, code in rows:
+        days[(date(year, month, day) - first_day).days] = code
+        counts = months[month - 1]
+        counts[statuses[code]] += 1
+        counts['total'] += 1
+
+    return {'year': year, 'months': months, 'days': days, 'codes': HEATMAP_CODES}
+
+
+def build_stats(total, present, absent, school_off):
+    """
+    Build the stats dict (with percentage) from raw counters.
+    """
+    percentage = 0
+    if total > 0:
+        percentage = round((present / total) * 100, 1)
+
+    return {
+        'total': total,
+        'present': present,
+        'absent': absent,
+        'school_off': school_off,
+        'percentage': percentage,
+    }
+
+
+def summary_to_stats(summary):
+    return build_stats(
+        total=summary.total_count,
+        present=summary.present_count,
+        absent=summary.absent_count,
+        school_off=summary.school_off_count,
+    )
+
+
+def rebuild_attendance_summaries(user_ids):
+    """
+    Recompute the summaries of the given users from their Attendance rows.
+    One GROUP BY query plus one upsert, regardless of how many users.
+    """
+    rows = (
+        Attendance.objects.filter(user_id__in=user_ids)
+        .values('user_id')
+        .annotate(**stats_aggregates())
+    )
+    counts = {row['user_id']: row for row in rows}
+
+    summaries = []
+    for user_id in user_ids:
+        row = counts.get(user_id, {})
+        summaries.append(AttendanceSummary(
+            user_id=user_id,
+            present_count=row.get('present', 0),
+            absent_count=row.get('absent', 0),
+            school_off_count=row.get('school_off', 0),
+            total_count=row.get('total', 0),
+        ))
+
+    AttendanceSummary.objects.bulk_create(summaries, **upsert_options(
+        unique_fields=['user'],
+        update_fields=['present_count', 'absent_count', 'school_off_count', 'total_count', 'updated_at'],
+    ))
+    transaction.on_commit(lambda: invalidate_attendance_versions(user_ids))
+    return summaries
+
+
+def rollup_attendance_days(dates, computed_at):
+    """
+    Recount the site-wide DailyAttendanceRollup rows of the given dates.
+    One GROUP BY date plus one upsert; dates left without any record get
+    zero counters.
+    """
+    rows = (
+        Attendance.objects.filter(date__in=dates)
+        .values('date')
+        .annotate(**stats_aggregates())
+        .order_by()
+    )
+    counts = {row['date']: row for row in rows}
+
+    rollups = []
+    for target_date in dates:
+        row = counts.get(target_date, {})
+        rollups.append(DailyAttendanceRollup(
+            date=target_date,
+            present_count=row.get('present', 0),
+            absent_count=row.get('absent', 0),
+            school_off_count=row.get('school_off', 0),
+            total_count=row.get('total', 0),
+            computed_at=computed_at,
+        ))
+
+    DailyAttendanceRollup.objects.bulk_create(rollups, **upsert_options(
+        unique_fields=['date'],
+        update_fields=['present_count', 'absent_count', 'school_off_count', 'total_count', 'computed_at'],
+    ))
+    return rollups
+
+
+def get_attendance_summary_stats(user):
+    """
+    Read a user's stats from their summary row, building it on first use.
+    """
+    summary = AttendanceSummary.objects.filter(user=user).first()
+    if summary is None:
+        summary = build_attendance_summary(user)
+    return summary_to_stats(summary)
+
+
+def build_attendance_summary(user):
+    """
+    Create a missing summary row the way a first write does, so a read
+    racing that write cannot overwrite its counts.
+    """
+    with transaction.atomic():
+        return lock_attendance_summary(user)
+
+
+def lock_attendance_summary(user):
+    """
+    Lock the user's summary row until the end of the current transaction
+    and return it. Concurrent writes for the same user queue up behind it,
+    so two marks of the same date cannot both count themselves as newly
+    created.
+    """
+    return lock_attendance_summaries([user.pk])[user.pk]
+
+
+def lock_attendance_summaries(user_ids):
+    """
+    Lock the summary rows of several users (in user-id order, so concurrent
+    writers don't deadlock) and return them as {user_id: summary}.
+
+    Missing rows are inserted before anything is counted, and only counted
+    once they are locked: a concurrent first write blocks on the INSERT's
+    unique key, so it can never overwrite the counts with ones read early.
+    """
+    user_ids = sorted(set(user_ids))
+    locked = AttendanceSummary.objects.select_for_update().filter(user_id__in=user_ids).order_by('user_id')
+    summaries = {summary.user_id: summary for summary in locked}
+
+    missing = [user_id for user_id in user_ids if user_id not in summaries]
+    if missing:
+        # First write since the summaries were introduced
+        AttendanceSummary.objects.bulk_create(
+            [AttendanceSummary(user_id=user_id) for user_id in missing],
+            ignore_conflicts=True,
+        )
+        list(locked.filter(user_id__in=missing))
+        summaries.update((summary.user_id, summary) for summary in rebuild_attendance_summaries(missing))
+    return summaries
+
+
+def get_cached_attendance_stats(user, version=None):
+    """
+    The user's stats from the cache, keyed by their attendance version so
+    that any write makes the next read fall through to the summary row.
+    Pass ``version`` when the caller already read it, e.g. for the ETag.
+    """
+    if version is None:
+        version = get_attendance_version(user.pk)
+    key = f'attendance:stats:{user.pk}:{version}'
+    stats = cache.get(key)
+    if stats is None:
+        stats = get_attendance_summary_stats(user)
+        cache.set(key, stats, settings.ATTENDANCE_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+async def aget_attendance_summary_stats(user):
+    """
+    Async get_attendance_summary_stats(); the rare first-use build runs
+    in a thread.
+    """
+    summary = await AttendanceSummary.objects.filter(user=user).afirst()
+    if summary is None:
+        summary = await sync_to_async(build_attendance_summary)(user)
+    return summary_to_stats(summary)
+
+
+async def aget_cached_attendance_stats(user, version=None):
+    """
+    Async get_cached_attendance_stats(), using the async cache API.
+    """
+    if version is None:
+        version = await aget_attendance_version(user.pk)
+    key = f'attendance:stats:{user.pk}:{version}'
+    stats = await cache.aget(key)
+    if stats is None:
+        stats = await aget_attendance_summary_stats(user)
+        await cache.aset(key, stats, settings.ATTENDANCE_STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def record_status_changes(user, transitions):
+    """
+    Apply several (old_status, new_status) flips to the summary in one UPDATE.
+    old_status is None when the Attendance row was just created. Must be
+    called in the same transaction as the Attendance write.
+    """
+    flips = [(old, new) for old, new in transitions if old != new]
+    if not flips:
+        return
+
+    deltas = Counter()
+    for old_status, new_status in flips:
+        deltas[SUMMARY_FIELDS[new_status]] += 1
+        if old_status is None:
+            deltas['total_count'] += 1
+        else:
+            deltas[SUMMARY_FIELDS[old_status]] -= 1
+
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    # No savepoint: callers writing many users already run in a transaction
+    with transaction.atomic(savepoint=False):
+        if changes:
+            updated = AttendanceSummary.objects.filter(user=user).update(**changes)
+            if not updated:
+                # No summary yet: build it from the rows, which already include this write
+                rebuild_attendance_summaries([user.pk])
+        # Invalidate cached stats and history once the new rows are visible,
+        # even when flips cancel out (swapped days still change the history)
+        transaction.on_commit(lambda: bump_attendance_version(user.pk))
@@ -1,3 +1,757 @@
-from django.test import TestCase
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, Client, AsyncClient
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.contrib.auth.models import User
+from django.urls import reverse
+from datetime import date
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.core.cache import cache
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
+from accounts.models import NotificationTrigger
+from .models import Attendance, AttendanceSummary, DailyAttendanceRollup
+from .stats import compute_attendance_stats, get_attendance_summary_stats, record_status_changes
+from .cache import get_attendance_version
+import json
+import os
+import tempfile
+import threading
 
-# Create your tests here.
+
+def make_attendance(user, target_date, is_present=False, is_school_off=False):
+    return Attendance.objects.create(
+        user=user,
+        date=target_date,
+        day=target_date.day,
+        month=target_date.month,
+        is_present=is_present,
+        is_school_off=is_school_off,
+    )
+
+
+class AttendanceStatsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+        make_attendance(self.user, date(2026, 1, 5), is_present=True)
+        make_attendance(self.user, date(2026, 1, 6), is_present=True)
+        make_attendance(self.user, date(2026, 1, 7))
+        make_attendance(self.user, date(2026, 1, 8), is_school_off=True)
+
+    def test_compute_stats_single_query(self):
+        with self.assertNumQueries(1):
+            stats = compute_attendance_stats(self.user)
+        self.assertEqual(stats, {
+            'total': 4,
+            'present': 2,
+            'absent': 1,
+            'school_off': 1,
+            'percentage': 50.0,
+        })
+
+    def test_compute_stats_no_records(self):
+        other = User.objects.create_user(username='other', password='password123')
+        stats = compute_attendance_stats(other)
+        self.assertEqual(stats['total'], 0)
+        self.assertEqual(stats['percentage'], 0)
+
+    def test_stats_api(self):
+        response = self.client.get(reverse('api_attendance_stats'))
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.content)
+        self.assertEqual(data['present'], 2)
+        self.assertEqual(data['absent'], 1)
+        self.assertEqual(data['school_off'], 1)
+        self.assertEqual(data['percentage'], 50.0)
+
+    def test_home_stats_context(self):
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['present_count'], 2)
+        self.assertEqual(response.context['absent_count'], 1)
+        self.assertEqual(response.context['school_off_count'], 1)
+        self.assertEqual(response.context['attendance_percentage'], 50.0)
+
+
+class AttendanceSummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+
+    def mark(self, status, target_date='2026-01-05'):
+        return self.client.post(reverse('mark_attendance'), {'status': status, 'date': target_date})
+
+    def test_mark_updates_summary(self):
+        self.mark('present', '2026-01-05')
+        self.mark('absent', '2026-01-06')
+        summary = AttendanceSummary.objects.get(user=self.user)
+        self.assertEqual(summary.total_count, 2)
+        self.assertEqual(summary.present_count, 1)
+        self.assertEqual(summary.absent_count, 1)
+
+    def test_status_flip_moves_counter(self):
+        self.mark('present')
+        self.mark('school_off')
+        summary = AttendanceSummary.objects.get(user=self.user)
+        self.assertEqual(summary.total_count, 1)
+        self.assertEqual(summary.present_count, 0)
+        self.assertEqual(summary.school_off_count, 1)
+
+    def test_summary_matches_full_scan(self):
+        self.mark('present', '2026-01-05')
+        self.mark('absent', '2026-01-06')
+        self.mark('school_off', '2026-01-06')
+        self.assertEqual(
+            get_attendance_summary_stats(self.user),
+            compute_attendance_stats(self.user),
+        )
+
+    def test_reconcile_command_rebuilds_summaries(self):
+        make_attendance(self.user, date(2026, 1, 5), is_present=True)
+        make_attendance(self.user, date(2026, 1, 6))
+        other = User.objects.create_user(username='other', password='password123')
+        call_command('reconcile_attendance_summaries', batch_size=1, stdout=StringIO())
+        summary = AttendanceSummary.objects.get(user=self.user)
+        self.assertEqual(summary.total_count, 2)
+        self.assertEqual(summary.present_count, 1)
+        self.assertEqual(AttendanceSummary.objects.get(user=other).total_count, 0)
+
+    def test_first_write_builds_missing_summary(self):
+        make_attendance(self.user, date(2026, 1, 5), is_present=True)
+        make_attendance(self.user, date(2026, 1, 6))
+        AttendanceSummary.objects.all().delete()
+        self.mark('school_off', '2026-01-07')
+        summary = AttendanceSummary.objects.get(user=self.user)
+        self.assertEqual(
+            (summary.total_count, summary.present_count, summary.absent_count, summary.school_off_count),
+            (3, 1, 1, 1),
+        )
+
+    def test_deleting_user_removes_summary(self):
+        make_attendance(self.user, date(2026, 1, 5), is_present=True)
+        self.user.delete()
+        self.assertFalse(AttendanceSummary.objects.exists())
+        self.assertFalse(Attendance.objects.exists())
+
+class StatsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+        self.url = reverse('api_attendance_stats')
+
+    def mark(self, url_name, data):
+        # Cache invalidation runs on commit, which TestCase never reaches on its own
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse(url_name), data)
+
+    def summary_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            data = json.loads(self.client.get(self.url).content)
+        return data, [q for q in queries if 'my_attendance_attendancesummary' in q['sql']]
+
+    def test_repeat_reads_hit_cache(self):
+        self.mark('mark_attendance', {'status': 'present', 'date': '2026-01-05'})
+        data, queries = self.summary_queries()
+        self.assertEqual(data['present'], 1)
+        self.assertTrue(queries)
+        data, queries = self.summary_queries()
+        self.assertEqual(data['present'], 1)
+        self.assertEqual(queries, [])
+
+    def test_mark_is_reflected_immediately(self):
+        self.mark('mark_attendance', {'status': 'present', 'date': '2026-01-05'})
+        self.assertEqual(self.summary_queries()[0]['present'], 1)
+        self.mark('mark_attendance', {'status': 'absent', 'date': '2026-01-05'})
+        data = self.summary_queries()[0]
+        self.assertEqual((data['present'], data['absent']), (0, 1))
+        self.mark('mark_attendance_bulk', {'status': 'school_off', 'dates': ['2026-01-06', '2026-01-07']})
+        self.assertEqual(self.summary_queries()[0]['school_off'], 2)
+
+    def test_direct_edit_is_reflected(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record = make_attendance(self.user, date(2026, 1, 5))
+        self.assertEqual(self.summary_queries()[0]['absent'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            record.is_present = True
+            record.save()
+        data = self.summary_queries()[0]
+        self.assertEqual((data['present'], data['absent']), (1, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delete()
+        self.assertEqual(self.summary_queries()[0]['total'], 0)
+
+    def test_deploy_check_requires_shared_cache(self):
+        from .checks import check_shared_cache
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['my_attendance.E001'])
+        with self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'attendance_manager_cache',
+        }}):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['my_attendance.W001'])
+        with self.settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://localhost:6379/1',
+        }}):
+            self.assertEqual(check_shared_cache(None), [])
+
+    def test_deploy_check_flags_cached_db_sessions_on_database_cache(self):
+        from .checks import check_session_cache
+        database_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'attendance_manager_cache',
+        }}
+        with self.settings(SESSION_ENGINE='django.contrib.sessions.backends.cached_db', CACHES=database_cache):
+            self.assertEqual([error.id for error in check_session_cache(None)], ['my_attendance.W002'])
+        with self.settings(SESSION_ENGINE='django.contrib.sessions.backends.db', CACHES=database_cache):
+            self.assertEqual(check_session_cache(None), [])
+
+    def test_version_is_read_once_per_request(self):
+        for name in ['api_attendance_stats', 'home']:
+            with mock.patch('my_attendance.views.get_attendance_version', wraps=get_attendance_version) as views_read, \
+                 mock.patch('my_attendance.stats.get_attendance_version') as stats_read:
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+            self.assertEqual(views_read.call_count, 1, name)
+            stats_read.assert_not_called()
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+
+    def test_stats_etag_and_304(self):
+        url = reverse('api_attendance_stats')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in queries if 'my_attendance_' in q['sql']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('mark_attendance'), {'status': 'present'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['present'], 1)
+
+    def test_today_etag_changes_when_marked(self):
+        url = reverse('api_check_today')
+        response = self.client.get(url)
+        self.assertFalse(json.loads(response.content)['marked'])
+        etag = response['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('mark_attendance'), {'status': 'present'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(json.loads(response.content)['marked'])
+
+class AttendanceHistoryTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+        for day in range(1, 6):
+            make_attendance(self.user, date(2026, 1, day), is_present=day % 2 == 0)
+
+    def test_history_api_pages_with_cursor(self):
+        url = reverse('api_attendance_history')
+        data = json.loads(self.client.get(url, {'limit': 2}).content)
+        self.assertEqual([r['date'] for r in data['records']], ['2026-01-05', '2026-01-04'])
+        self.assertEqual(data['records'][1]['status'], 'present')
+        self.assertEqual(data['next_before'], '2026-01-04')
+
+        data = json.loads(self.client.get(url, {'limit': 2, 'before': data['next_before']}).content)
+        self.assertEqual([r['date'] for r in data['records']], ['2026-01-03', '2026-01-02'])
+
+        data = json.loads(self.client.get(url, {'limit': 2, 'before': data['next_before']}).content)
+        self.assertEqual([r['date'] for r in data['records']], ['2026-01-01'])
+        self.assertIsNone(data['next_before'])
+
+    def test_history_api_rejects_bad_cursor(self):
+        response = self.client.get(reverse('api_attendance_history'), {'before': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_home_renders_one_page(self):
+        response = self.client.get(reverse('home'), {'before': '2026-01-03'})
+        self.assertEqual([r.date for r in response.context['history'].records], [date(2026, 1, 2), date(2026, 1, 1)])
+        self.assertIsNone(response.context['history'].next_before)
+
+
+
+class HistoryFragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+        make_attendance(self.user, date(2026, 1, 1), is_present=True)
+
+    def mark(self, target_date, status):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('mark_attendance'), {'status': status, 'date': str(target_date)})
+
+    def history_queries(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'), params or {})
+        return response, [q for q in queries if 'FROM "my_attendance_attendance"' in q['sql']]
+
+    def test_repeat_visit_skips_history_query(self):
+        response, queries = self.history_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, '01 Jan 2026')
+
+        response, queries = self.history_queries()
+        self.assertEqual(queries, [])
+        self.assertContains(response, '01 Jan 2026')
+
+    def test_filters_and_cursor_are_part_of_the_key(self):
+        self.history_queries()
+        response, queries = self.history_queries({'start_date': '2026-01-02'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotContains(response, '01 Jan 2026')
+
+    def test_marking_invalidates_fragment(self):
+        self.history_queries()
+        self.mark(date(2026, 1, 2), 'absent')
+        response, queries = self.history_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, '02 Jan 2026')
+
+    def test_cancelling_flips_still_bump_version(self):
+        version = get_attendance_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            record_status_changes(self.user, [('present', 'absent'), ('absent', 'present')])
+        self.assertNotEqual(get_attendance_version(self.user.pk), version)
+
+
+class ExportAttendanceTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+        make_attendance(self.user, date(2026, 1, 2), is_present=True)
+        make_attendance(self.user, date(2026, 1, 1), is_school_off=True)
+        make_attendance(self.user, date(2026, 1, 3))
+
+    def export(self, params=None):
+        response = self.client.get(reverse('export_attendance'), params or {})
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode().splitlines()
+
+    def test_export_streams_all_rows_oldest_first(self):
+        response, lines = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment', response['Content-Disposition'])
+        self.assertEqual(lines, [
+            'Date,Day,Month,Year,Status',
+            '2026-01-01,1,1,2026,School Off',
+            '2026-01-02,2,1,2026,Present',
+            '2026-01-03,3,1,2026,Absent',
+        ])
+
+    def test_export_honors_date_filters(self):
+        response, lines = self.export({'start_date': '2026-01-02', 'end_date': '2026-01-02', 'before': 'x'})
+        self.assertEqual(lines[1:], ['2026-01-02,2,1,2026,Present'])
+        self.assertIn('2026-01-02', response['Content-Disposition'])
+
+    def test_export_filename_with_non_ascii_username(self):
+        user = User.objects.create_user(username='zoë', password='password123')
+        self.client.force_login(user)
+        response, lines = self.export()
+        self.assertEqual(response['Content-Disposition'], "attachment; filename*=utf-8''attendance_zo%C3%AB.csv")
+
+    def test_export_only_includes_own_records(self):
+        other = User.objects.create_user(username='other', password='password123')
+        make_attendance(other, date(2026, 1, 4), is_present=True)
+        response, lines = self.export()
+        self.assertEqual(len(lines), 4)
+
+
+class ImportAttendanceTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+        self.other = User.objects.create_user(username='other', password='password123')
+        make_attendance(self.user, date(2026, 1, 1), is_present=True)
+
+    def write_csv(self, content):
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as csv_file:
+            csv_file.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_csv(self, content, *args):
+        out = StringIO()
+        call_command('import_attendance', self.write_csv(content), *args, stdout=out)
+        return out.getvalue()
+
+    def test_command_upserts_and_fills_day_month(self):
+        output = self.import_csv(
+            'username,date,status\n'
+            'testuser,2026-01-01,absent\n'
+            'testuser,2026-02-03,School Off\n'
+            'other,2026-01-01,present\n',
+            '--batch-size', '2',
+        )
+        self.assertIn('3 records (2 created, 1 updated), 0 rows skipped', output)
+
+        record = Attendance.objects.get(user=self.user, date=date(2026, 2, 3))
+        self.assertEqual((record.day, record.month, record.is_school_off), (3, 2, True))
+        self.assertFalse(Attendance.objects.get(user=self.user, date=date(2026, 1, 1)).is_present)
+        self.assertTrue(Attendance.objects.get(user=self.other).is_present)
+        self.assertEqual(get_attendance_summary_stats(self.user), compute_attendance_stats(self.user))
+
+    def test_command_reports_invalid_rows(self):
+        output = self.import_csv(
+            'username,date,status\n'
+            'testuser,01/02/2026,present\n'
+            'testuser,2026-01-03,late\n'
+            'nobody,2026-01-04,present\n'
+            'testuser,2026-01-05,present\n'
+        )
+        self.assertIn('Line 2: Invalid date', output)
+        self.assertIn('Line 3: Invalid status', output)
+        self.assertIn('Line 4: Unknown user "nobody"', output)
+        self.assertIn('1 records (1 created, 0 updated), 3 rows skipped', output)
+
+    def test_batch_is_one_upsert_across_users(self):
+        from .importer import import_attendance
+        users = [User.objects.create_user(username=f'bulk{i}') for i in range(20)]
+        lines = ['username,date,status'] + [
+            f'{user.username},2026-03-{day:02d},present' for user in users for day in range(1, 6)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            result = import_attendance(lines)
+        self.assertEqual((result.created, result.error_count), (100, 0))
+        upserts = [q for q in queries if q['sql'].startswith('INSERT INTO "my_attendance_attendance" ')]
+        self.assertEqual(len(upserts), 1)
+        # User lookup, lock, existing rows, upsert, then one summary UPDATE per user
+        self.assertLessEqual(len(queries), len(users) + 10)
+        self.assertEqual(get_attendance_summary_stats(users[0]), compute_attendance_stats(users[0]))
+
+    def test_dry_run_saves_nothing(self):
+        output = self.import_csv('date,status\n2026-01-01,absent\n2026-01-02,present\n', '--user', 'testuser', '--dry-run')
+        self.assertIn('Dry run: would import 2 records (1 created, 1 updated)', output)
+        self.assertEqual(Attendance.objects.filter(user=self.user).count(), 1)
+        self.assertTrue(Attendance.objects.get(user=self.user).is_present)
+
+    def test_upload_imports_own_records_from_export_format(self):
+        upload = SimpleUploadedFile(
+            'attendance.csv',
+            '\ufeffDate,Day,Month,Year,Status\r\n2026-01-02,2,1,2026,Present\r\n2026-01-03,3,1,2026,Absent\r\n'.encode('utf-8'),
+            content_type='text/csv',
+        )
+        data = json.loads(self.client.post(reverse('upload_attendance'), {'file': upload}).content)
+        self.assertTrue(data['success'])
+        self.assertEqual((data['created'], data['updated'], data['error_count']), (2, 0, 0))
+        self.assertEqual(Attendance.objects.filter(user=self.user).count(), 3)
+
+    def test_upload_requires_columns(self):
+        upload = SimpleUploadedFile('attendance.csv', b'when,what\n2026-01-02,present\n')
+        data = json.loads(self.client.post(reverse('upload_attendance'), {'file': upload, 'dry_run': '1'}).content)
+        self.assertEqual(data['errors'], [{'line': 1, 'message': 'Missing columns: date, status.'}])
+
+    def test_upload_with_bad_byte_saves_nothing(self):
+        rows = ''.join(f'{date.fromordinal(date(2020, 1, 1).toordinal() + i)},present\n' for i in range(1500))
+        upload = SimpleUploadedFile('attendance.csv', f'date,status\n{rows}'.encode() + b'2026-01-02,\xff\n')
+        data = json.loads(self.client.post(reverse('upload_attendance'), {'file': upload}).content)
+        self.assertFalse(data['success'])
+        self.assertEqual(Attendance.objects.filter(user=self.user).count(), 1)
+
+    def test_upload_requires_file(self):
+        data = json.loads(self.client.post(reverse('upload_attendance')).content)
+        self.assertFalse(data['success'])
+
+
+class AttendanceBreakdownTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+        make_attendance(self.user, date(2024, 1, 1), is_present=True)
+        make_attendance(self.user, date(2024, 1, 2))
+        make_attendance(self.user, date(2024, 3, 1), is_school_off=True)
+        make_attendance(self.user, date(2024, 12, 31), is_present=True)
+        make_attendance(self.user, date(2025, 1, 1), is_present=True)
+
+    def test_breakdown_counts_and_heatmap_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api_attendance_breakdown'), {'year': 2024})
+        self.assertEqual(len([q for q in queries if 'my_attendance_attendance' in q['sql']]), 1)
+
+        data = json.loads(response.content)
+        self.assertEqual(data['months'][0], {'month': 1, 'present': 1, 'absent': 1, 'school_off': 0, 'total': 2})
+        self.assertEqual(data['months'][2]['school_off'], 1)
+        self.assertEqual(data['months'][11]['present'], 1)
+
+        # 2024 is a leap year: March 1st is day 61
+        days = data['days']
+        self.assertEqual(len(days), 366)
+        self.assertEqual(days[:3], [1, 2, 0])
+        self.assertEqual(days[60], 3)
+        self.assertEqual(days[-1], 1)
+        self.assertEqual(sum(1 for code in days if code), 4)
+
+    def test_breakdown_defaults_to_current_year(self):
+        data = json.loads(self.client.get(reverse('api_attendance_breakdown')).content)
+        self.assertEqual(data['year'], date.today().year)
+
+    def test_breakdown_rejects_bad_year(self):
+        for year in ('twenty', '0', '10000'):
+            response = self.client.get(reverse('api_attendance_breakdown'), {'year': year})
+            self.assertEqual(response.status_code, 400)
+
+    def test_breakdown_etag_is_per_year(self):
+        url = reverse('api_attendance_breakdown')
+        etag = self.client.get(url, {'year': 2024})['ETag']
+        self.assertEqual(self.client.get(url, {'year': 2024}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, {'year': 2025}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class StaffDashboardTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.staff = User.objects.create_user(username='staff', password='password123', is_staff=True)
+        self.good = User.objects.create_user(username='good', password='password123')
+        self.poor = User.objects.create_user(username='poor', password='password123')
+        for offset in range(4):
+            make_attendance(self.good, date(2026, 1, 1 + offset), is_present=True)
+            make_attendance(self.poor, date(2026, 1, 1 + offset), is_present=offset == 0)
+        DailyAttendanceRollup.objects.create(
+            date=date(2026, 1, 1), present_count=2, total_count=2, computed_at=timezone.now(),
+        )
+
+    def test_dashboard_reads_only_rollups(self):
+        self.client.login(username='staff', password='password123')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('staff_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if 'FROM "my_attendance_attendance"' in q['sql']])
+
+        self.assertEqual(response.context['user_count'], 2)
+        self.assertEqual(response.context['average_percentage'], 62.5)
+        self.assertEqual(response.context['below_count'], 1)
+        self.assertEqual([summary.user for summary in response.context['below_users']], [self.poor])
+        self.assertContains(response, '25.0%')
+        self.assertEqual(len(response.context['daily_rollups']), 1)
+
+    def test_dashboard_is_staff_only(self):
+        self.client.login(username='good', password='password123')
+        response = self.client.get(reverse('staff_dashboard'))
+        self.assertEqual(response.status_code, 302)
+
+class BulkMarkAttendanceTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+        self.url = reverse('mark_attendance_bulk')
+
+    def test_bulk_mark_date_range(self):
+        make_attendance(self.user, date(2026, 1, 6), is_present=True)
+        response = self.client.post(self.url, {'status': 'school_off', 'start_date': '2026-01-05', 'end_date': '2026-01-07'})
+        data = json.loads(response.content)
+        self.assertTrue(data['success'])
+        self.assertEqual(data['created'], 2)
+        self.assertEqual(data['updated'], 1)
+        self.assertEqual(
+            data['results'],
+            [
+                {'date': '2026-01-05', 'created': True},
+                {'date': '2026-01-06', 'created': False},
+                {'date': '2026-01-07', 'created': True},
+            ],
+        )
+        self.assertEqual(Attendance.objects.filter(user=self.user, is_school_off=True).count(), 3)
+        record = Attendance.objects.get(user=self.user, date=date(2026, 1, 7))
+        self.assertEqual((record.day, record.month), (7, 1))
+        self.assertEqual(get_attendance_summary_stats(self.user), compute_attendance_stats(self.user))
+
+    def test_bulk_mark_date_list_json(self):
+        response = self.client.post(
+            self.url,
+            json.dumps({'status': 'present', 'dates': ['2026-02-02', '2026-02-04']}),
+            content_type='application/json',
+        )
+        data = json.loads(response.content)
+        self.assertTrue(data['success'])
+        self.assertEqual(Attendance.objects.filter(user=self.user, is_present=True).count(), 2)
+
+    def test_bulk_mark_rejects_bad_input(self):
+        data = json.loads(self.client.post(self.url, {'status': 'late', 'dates': ['2026-02-02']}).content)
+        self.assertFalse(data['success'])
+        data = json.loads(self.client.post(self.url, {'status': 'present', 'dates': ['02/02/2026']}).content)
+        self.assertFalse(data['success'])
+        data = json.loads(self.client.post(self.url, {'status': 'present', 'start_date': '2026-01-01', 'end_date': '2027-06-01'}).content)
+        self.assertFalse(data['success'])
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_bulk_mark_rejects_badly_shaped_json(self):
+        for body in [
+            [1, 2],
+            {'status': 'present', 'dates': [20260101]},
+            {'status': 'present', 'dates': '2026-01-01'},
+            {'status': ['present'], 'dates': ['2026-01-01']},
+            {'status': 'present', 'start_date': 20260101, 'end_date': 20260102},
+        ]:
+            response = self.client.post(self.url, json.dumps(body), content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(json.loads(response.content)['success'], body)
+        self.assertFalse(Attendance.objects.exists())
+
+
+class ConcurrentMarkAttendanceTests(TransactionTestCase):
+    # On SQLite the writers are serialised by BEGIN IMMEDIATE, where
+    # select_for_update() is a no-op: this checks the view stays correct
+    # under concurrency, not the row locking MySQL/PostgreSQL rely on
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='password123')
+
+    def test_parallel_marks_same_date(self):
+        workers = 8
+        barrier = threading.Barrier(workers)
+        responses = []
+
+        def mark(client, status):
+            try:
+                barrier.wait(timeout=10)
+                responses.append(client.post(reverse('mark_attendance'), {'status': status, 'date': '2026-01-05'}))
+            finally:
+                connection.close()
+
+        threads = []
+        for i in range(workers):
+            client = Client()
+            client.force_login(self.user)
+            threads.append(threading.Thread(target=mark, args=(client, 'present' if i % 2 else 'absent')))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(responses), workers)
+        for response in responses:
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(json.loads(response.content)['success'])
+        self.assertEqual(Attendance.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(sum(json.loads(r.content)['message'].startswith('Attendance marked') for r in responses), 1)
+        summary = AttendanceSummary.objects.get(user=self.user)
+        self.assertEqual(summary.total_count, 1)
+        self.assertEqual(summary.present_count + summary.absent_count, 1)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        from AttendanceManager.metrics import HISTOGRAMS
+        for histogram in HISTOGRAMS:
+            histogram.reset()
+        self.client = Client()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        self.client.login(username='testuser', password='password123')
+
+    def test_metrics_requires_staff(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    def test_metrics_report_views(self):
+        self.client.get(reverse('api_attendance_stats'))
+        self.client.post(reverse('mark_attendance'), {'status': 'present'})
+        self.user.is_staff = True
+        self.user.save()
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_count{view="api_attendance_stats"} 1', body)
+        self.assertIn('http_request_sql_queries_count{view="mark_attendance"} 1', body)
+        self.assertIn('http_request_sql_duration_seconds_bucket{view="mark_attendance",le="+Inf"} 1', body)
+
+    async def test_metrics_count_queries_under_asgi(self):
+        from AttendanceManager.metrics import sql_queries
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        await client.get(reverse('api_attendance_stats'))
+        self.assertGreater(sql_queries.series['api_attendance_stats']['sum'], 0)
+
+
+
+class AsyncEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='password123')
+        make_attendance(self.user, date(2026, 1, 1), is_present=True)
+        make_attendance(self.user, date.today())
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    async def test_asgi_routes_to_async_views(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+
+        response = await client.get(reverse('api_check_today'))
+        self.assertEqual(response.resolver_match.func.__name__, 'acheck_today_attendance')
+        self.assertTrue(json.loads(response.content)['marked'])
+
+        response = await client.get(reverse('api_attendance_stats'))
+        self.assertEqual(response.resolver_match.func.__name__, 'aget_attendance_stats')
+        data = json.loads(response.content)
+        self.assertEqual((data['total'], data['present'], data['absent']), (2, 1, 1))
+
+    async def test_async_views_send_the_sync_etags(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        views = {'api_check_today': 'check_today_attendance', 'api_attendance_stats': 'get_attendance_stats'}
+        for name, sync_view in views.items():
+            sync_response = await sync_to_async(self.client.get)(reverse(name))
+            self.assertEqual(sync_response.resolver_match.func.__name__, sync_view)
+            response = await client.get(reverse(name), headers={'If-None-Match': sync_response['ETag']})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['ETag'], sync_response['ETag'])
+
+class BenchmarkCommandTests(TestCase):
+    def test_benchmark_runs_and_deletes_seeded_data(self):
+        out = StringIO()
+        call_command('benchmark_attendance', users=3, days=5, requests=2, task_runs=1, clients=2, stdout=out)
+        output = out.getvalue()
+        for target in ['home', 'mark_attendance', 'get_attendance_stats', 'check_notification_triggers',
+                       'task create_chrome_notification_trigger_chunk', 'task cleanup_old_notification_triggers']:
+            self.assertIn(target, output)
+        self.assertNotIn('❌', output)
+        self.assertFalse(User.objects.filter(username__startswith='bench_').exists())
+        self.assertFalse(Attendance.objects.exists())
+        self.assertFalse(NotificationTrigger.objects.exists())
+
+
+
+class BenchmarkPollingCommandTests(LiveServerTestCase):
+    def test_polls_live_server_as_logged_in_user(self):
+        out = StringIO()
+        call_command(
+            'benchmark_polling', '--base-url', self.live_server_url, '--label', 'WSGI',
+            '--clients', '2', '--duration', '0.5', stdout=out,
+        )
+        output = out.getvalue()
+        self.assertIn('[WSGI]', output)
+        for line in output.splitlines():
+            if line.startswith(('/api/', '/notifications/', 'all ')):
+                requests, errors = int(line.split()[1]), int(line.split()[-1])
+                self.assertGreater(requests, 0)
+                self.assertEqual(errors, 0)
+        # The temporary user and its session are removed afterwards
+        self.assertFalse(User.objects.filter(username__startswith='bench_polling_').exists())
@@ -4,9 +4,15 @@ from . import views
 urlpatterns = [
     path('',views.home, name='home'),
     path('about/', views.about, name='about'),
+    path('staff/analytics/', views.staff_dashboard, name='staff_dashboard'),
     path('mark/', views.mark_attendance, name='mark_attendance'),
+    path('mark/bulk/', views.mark_attendance_bulk, name='mark_attendance_bulk'),
+    path('export/', views.export_attendance, name='export_attendance'),
+    path('import/', views.upload_attendance, name='upload_attendance'),
     
     # API endpoints for notifications
     path('api/attendance/today/', views.check_today_attendance, name='api_check_today'),
     path('api/attendance/stats/', views.get_attendance_stats, name='api_attendance_stats'),
+    path('api/attendance/history/', views.get_attendance_history, name='api_attendance_history'),
+    path('api/attendance/breakdown/', views.get_attendance_breakdown, name='api_attendance_breakdown'),
 ]
\ No newline at end of file
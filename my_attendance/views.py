@@ -1,9 +1,23 @@
-from .models import Attendance
+from .models import Attendance, AttendanceSummary, DailyAttendanceRollup
+from .stats import aget_cached_attendance_stats, attendance_breakdown, get_cached_attendance_stats, status_of
+from .marking import MAX_BULK_DATES, STATUS_FLAGS, bulk_mark_attendance, date_range, mark_attendance_for_date
+from .cache import aget_attendance_version, get_attendance_version
+from .history import HISTORY_PAGE_SIZE, MAX_HISTORY_PAGE_SIZE, HistoryPage, filter_by_date_range, history_page, parse_date
+from .export import attendance_csv_rows
+from .importer import import_attendance
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from datetime import date, datetime
-from django.views.decorators.http import require_POST, require_GET
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db.models import Avg, Count, ExpressionWrapper, F, FloatField, Max
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, quote_etag
+from datetime import MAXYEAR, MINYEAR, date
+import codecs
+import json
+from django.views.decorators.http import require_POST, require_GET, condition
+from django.views.decorators.cache import cache_control
 from django.views.decorators.csrf import csrf_exempt # Using JS csrf token helper instead
 
 # Create your views here.
@@ -11,53 +25,29 @@ from django.views.decorators.csrf import csrf_exempt # Using JS csrf token helpe
 def home(request):
     context = {}
     if request.user.is_authenticated:
-        # Get date filter parameters
-        start_date = request.GET.get('start_date')
-        end_date = request.GET.get('end_date')
-        
         # Base queryset for ALL records (for stats calculation)
         all_attendance_records = Attendance.objects.filter(user=request.user)
         
-        # Filtered queryset for display
-        attendance_records = all_attendance_records
-        
-        # Apply date filters if provided (only for display, not stats)
-        if start_date:
-            try:
-                start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
-                attendance_records = attendance_records.filter(date__gte=start_date_obj)
-                context['start_date'] = start_date
-            except ValueError:
-                pass
-                
-        if end_date:
-            try:
-                end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
-                attendance_records = attendance_records.filter(date__lte=end_date_obj)
-                context['end_date'] = end_date
-            except ValueError:
-                pass
-        
-        attendance_records = attendance_records.order_by('-date')
-        context['attendance_records'] = attendance_records
+        # Date filters apply only to the displayed records, not stats
+        attendance_records, filters = filter_by_date_range(all_attendance_records, request.GET)
+        context.update(filters)
         
-        # Calculate stats from ALL records (not filtered ones)
-        present_count = all_attendance_records.filter(is_present=True).count()
-        school_off_count = all_attendance_records.filter(is_school_off=True).count()
-        # Absent is when not present AND not school off
-        absent_count = all_attendance_records.filter(is_present=False, is_school_off=False).count()
+        # Keyset pagination: only one page of rows is loaded and rendered.
+        # The page is lazy; the template caches the rendered history per
+        # attendance version, so a repeat visit runs neither the query
+        # nor the table rendering.
+        before = parse_date(request.GET.get('before'))
+        context['history'] = HistoryPage(attendance_records, before=before)
+        context['before'] = before
+        context['attendance_version'] = attendance_version(request)
+        context['history_cache_timeout'] = settings.ATTENDANCE_HISTORY_CACHE_TIMEOUT
         
-        context['present_count'] = present_count
-        context['absent_count'] = absent_count
-        context['school_off_count'] = school_off_count
-        
-        # Calculate attendance percentage from ALL records
-        total_days = all_attendance_records.count()
-        if total_days > 0:
-            attendance_percentage = (present_count / total_days) * 100
-            context['attendance_percentage'] = round(attendance_percentage, 1)
-        else:
-            context['attendance_percentage'] = 0
+        # Stats cover ALL records (not filtered ones), from cache or the summary row
+        stats = get_cached_attendance_stats(request.user, attendance_version(request))
+        context['present_count'] = stats['present']
+        context['absent_count'] = stats['absent']
+        context['school_off_count'] = stats['school_off']
+        context['attendance_percentage'] = stats['percentage']
         
     return render(request, 'my_attendance/home.html', context)
 
@@ -65,63 +55,108 @@ def about(request):
     return render(request, 'my_attendance/about.html')
 
 
+@staff_member_required
+def staff_dashboard(request):
+    """
+    Site-wide attendance numbers for staff. Reads only the rollups:
+    AttendanceSummary (one row per user) for percentages and
+    DailyAttendanceRollup (one row per day) for marking volume.
+    """
+    threshold = settings.ATTENDANCE_LOW_THRESHOLD
+    percentage = ExpressionWrapper(F('present_count') * 100.0 / F('total_count'), output_field=FloatField())
+
+    summaries = AttendanceSummary.objects.filter(total_count__gt=0)
+    overview = summaries.aggregate(users=Count('id'), average=Avg(percentage))
+    below = summaries.filter(present_count__lt=F('total_count') * threshold / 100.0)
+
+    context = {
+        'threshold': threshold,
+        'user_count': overview['users'],
+        'average_percentage': round(overview['average'] or 0, 1),
+        'below_count': below.count(),
+        'below_users': below.select_related('user').annotate(percentage=percentage).order_by('percentage')[:50],
+        'daily_rollups': DailyAttendanceRollup.objects.all()[:30],
+        'last_rollup': DailyAttendanceRollup.objects.aggregate(last=Max('computed_at'))['last'],
+    }
+    return render(request, 'my_attendance/staff_dashboard.html', context)
+
+
+@login_required
+@require_GET
+def export_attendance(request):
+    """
+    Stream the user's attendance history as CSV, honoring the dashboard's
+    start_date/end_date filters. Rows are sent as they are read.
+    """
+    records, filters = filter_by_date_range(Attendance.objects.filter(user=request.user), request.GET)
+
+    response = StreamingHttpResponse(attendance_csv_rows(records), content_type='text/csv')
+    filename = '_'.join(['attendance', request.user.username, *filters.values()])
+    response['Content-Disposition'] = content_disposition_header(True, f'{filename}.csv')
+    return response
+
+
+@login_required
+@require_POST
+def upload_attendance(request):
+    """
+    Import the user's own records from an uploaded CSV (date, status
+    columns). The file is checked to be UTF-8, then parsed line by line
+    as it is read. Send dry_run=1 to validate and count without saving.
+    """
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'success': False, 'message': 'A CSV file is required.'})
+    dry_run = request.POST.get('dry_run') in ('1', 'true', 'on')
+
+    # Batches commit as they go, so the whole file is decoded once up front:
+    # a bad byte near the end must not leave the rows before it half imported
+    try:
+        for _ in codecs.iterdecode(upload, 'utf-8-sig'):
+            pass
+    except UnicodeDecodeError:
+        return JsonResponse({'success': False, 'message': 'The file must be a UTF-8 encoded CSV.'})
+    upload.seek(0)
+
+    result = import_attendance(codecs.iterdecode(upload, 'utf-8-sig'), user=request.user, dry_run=dry_run)
+
+    summary = f"{result.imported} record{'s' if result.imported != 1 else ''}"
+    if dry_run:
+        message = f'Dry run: {summary} would be imported.'
+    else:
+        message = f'Imported {summary}.'
+    if result.error_count:
+        message += f" {result.error_count} row{'s' if result.error_count != 1 else ''} skipped."
+
+    return JsonResponse({'success': True, 'message': message, **result.as_dict()})
+
+
 @login_required
 @require_POST
 def mark_attendance(request):
-    print(f"Received attendance request from user: {request.user}")  # Debug log
-    print(f"POST data: {request.POST}")  # Debug log
-    
     status = request.POST.get('status')
     attendance_date = request.POST.get('date')  # New: allow custom date
     
     if not status:
-        print("No status provided")  # Debug log
         return JsonResponse({'success': False, 'message': 'Status is required.'})
+    if status not in STATUS_FLAGS:
+        return JsonResponse({'success': False, 'message': 'Invalid status assignment.'})
 
     # Use provided date or default to today
     if attendance_date:
-        try:
-            target_date = datetime.strptime(attendance_date, '%Y-%m-%d').date()
-        except ValueError:
+        target_date = parse_date(attendance_date)
+        if target_date is None:
             return JsonResponse({'success': False, 'message': 'Invalid date format.'})
     else:
         target_date = date.today()
     
-    print(f"Marking attendance for date: {target_date}")  # Debug log
+    # One atomic upsert on (user, date): double-clicks can't hit the unique constraint
+    created = mark_attendance_for_date(request.user, target_date, status)
     
-    # Check if record exists for this user and target date
-    attendance_qs = Attendance.objects.filter(user=request.user, date=target_date)
-    
-    if attendance_qs.exists():
-        attendance = attendance_qs.first()
-        created = False
-        message = f"Attendance updated successfully for {target_date.strftime('%B %d, %Y')}."
-    else:
-        # Create new record
-        attendance = Attendance(
-            user=request.user,
-            date=target_date,
-            day=target_date.day,
-            month=target_date.month,
-        )
-        created = True
+    if created:
         message = f"Attendance marked successfully for {target_date.strftime('%B %d, %Y')}."
-
-    # Update logic
-    if status == 'present':
-        attendance.is_present = True
-        attendance.is_school_off = False
-    elif status == 'absent':
-        attendance.is_present = False
-        attendance.is_school_off = False
-    elif status == 'school_off':
-        attendance.is_present = False
-        attendance.is_school_off = True
     else:
-        return JsonResponse({'success': False, 'message': 'Invalid status assignment.'})
-        
-    attendance.save()
-    print(f"Attendance saved successfully: {attendance}")  # Debug log
+        message = f"Attendance updated successfully for {target_date.strftime('%B %d, %Y')}."
     
     return JsonResponse({
         'success': True, 
@@ -129,7 +164,86 @@ def mark_attendance(request):
         'status': status,
         'date': str(target_date)
     })
+
+@login_required
+@require_POST
+def mark_attendance_bulk(request):
+    """
+    Mark a date range (start_date/end_date) or a list of dates with one status.
+    Accepts JSON or form data and writes everything in one transaction.
+    """
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'success': False, 'message': 'Invalid JSON body.'})
+        if not isinstance(data, dict):
+            return JsonResponse({'success': False, 'message': 'Expected a JSON object.'})
+        raw_dates = data.get('dates') or []
+        if not isinstance(raw_dates, list) or not all(isinstance(value, str) for value in raw_dates):
+            return JsonResponse({'success': False, 'message': 'dates must be a list of YYYY-MM-DD strings.'})
+    else:
+        data = request.POST
+        raw_dates = request.POST.getlist('dates')
+
+    status = data.get('status')
+    if not isinstance(status, str) or status not in STATUS_FLAGS:
+        return JsonResponse({'success': False, 'message': 'Invalid status assignment.'})
+
+    if raw_dates:
+        dates = [parse_date(value) for value in raw_dates]
+        if None in dates:
+            return JsonResponse({'success': False, 'message': 'Invalid date format.'})
+    else:
+        start_date = parse_date(data.get('start_date'))
+        end_date = parse_date(data.get('end_date'))
+        if not start_date or not end_date:
+            return JsonResponse({'success': False, 'message': 'Provide dates or a valid start_date and end_date.'})
+        if start_date > end_date:
+            return JsonResponse({'success': False, 'message': 'start_date must not be after end_date.'})
+        if (end_date - start_date).days >= MAX_BULK_DATES:
+            return JsonResponse({'success': False, 'message': f'At most {MAX_BULK_DATES} dates can be marked at once.'})
+        dates = date_range(start_date, end_date)
+
+    if len(set(dates)) > MAX_BULK_DATES:
+        return JsonResponse({'success': False, 'message': f'At most {MAX_BULK_DATES} dates can be marked at once.'})
+
+    results = bulk_mark_attendance(request.user, dates, status)
+    created_count = sum(1 for result in results if result['created'])
+
+    return JsonResponse({
+        'success': True,
+        'message': f"Attendance marked for {len(results)} day{'s' if len(results) != 1 else ''}.",
+        'status': status,
+        'created': created_count,
+        'updated': len(results) - created_count,
+        'results': results,
+    })
+
+def attendance_version(request):
+    """
+    The user's attendance version, read from the cache once per request
+    and shared by the ETag and the view.
+    """
+    if not hasattr(request, 'attendance_version'):
+        request.attendance_version = get_attendance_version(request.user.pk)
+    return request.attendance_version
+
+def attendance_etag(request):
+    """
+    Validator for the attendance JSON APIs: the user's attendance version,
+    which every write bumps. A cache lookup, so a 304 costs no stats query.
+    """
+    return f'{request.user.pk}-{attendance_version(request)}'
+
+def today_etag(request):
+    # "Marked today" also changes at midnight without any write
+    return f'{attendance_etag(request)}-{date.today()}'
+
+@login_required
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=today_etag)
 def check_today_attendance(request):
     """API endpoint to check if attendance is marked for today"""
     today = date.today()
@@ -145,23 +259,110 @@ def check_today_attendance(request):
 
 @login_required
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=attendance_etag)
 def get_attendance_stats(request):
     """API endpoint to get user's attendance statistics"""
-    attendance_records = Attendance.objects.filter(user=request.user)
-    
-    total_count = attendance_records.count()
-    present_count = attendance_records.filter(is_present=True).count()
-    absent_count = attendance_records.filter(is_present=False, is_school_off=False).count()
-    school_off_count = attendance_records.filter(is_school_off=True).count()
-    
-    percentage = 0
-    if total_count > 0:
-        percentage = round((present_count / total_count) * 100, 1)
-    
+    stats = get_cached_attendance_stats(request.user, attendance_version(request))
+    return JsonResponse(stats)
+
+# Async versions of the polling endpoints, routed under ASGI (see
+# AttendanceManager.urls_asgi). They send the same ETags as the sync views,
+# but the cache and ORM are awaited, so a waiting request holds no thread.
+
+async def conditional_json(request, etag, get_data):
+    """
+    304 if ``etag`` matches If-None-Match, else JSON from ``await get_data()``.
+    """
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(await get_data())
+    response.headers.setdefault('ETag', etag)
+    return response
+
+@login_required
+@require_GET
+@cache_control(private=True, no_cache=True)
+async def acheck_today_attendance(request):
+    """Async check_today_attendance"""
+    user = await request.auser()
+    today = date.today()
+
+    async def get_data():
+        marked = await Attendance.objects.filter(user=user, date=today).aexists()
+        return {'marked': marked, 'date': str(today)}
+
+    etag = f'{user.pk}-{await aget_attendance_version(user.pk)}-{today}'
+    return await conditional_json(request, etag, get_data)
+
+@login_required
+@require_GET
+@cache_control(private=True, no_cache=True)
+async def aget_attendance_stats(request):
+    """Async get_attendance_stats"""
+    user = await request.auser()
+    version = await aget_attendance_version(user.pk)
+    etag = f'{user.pk}-{version}'
+    return await conditional_json(request, etag, lambda: aget_cached_attendance_stats(user, version))
+
+def breakdown_year(request):
+    """
+    The ?year= of the breakdown API (default: this year), or None if invalid.
+    """
+    try:
+        year = int(request.GET.get('year', date.today().year))
+    except ValueError:
+        return None
+    return year if MINYEAR <= year <= MAXYEAR else None
+
+def breakdown_etag(request):
+    return f'{attendance_etag(request)}-{breakdown_year(request)}'
+
+@login_required
+@require_GET
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=breakdown_etag)
+def get_attendance_breakdown(request):
+    """API endpoint with per-month counts and per-day heatmap codes for one year"""
+    year = breakdown_year(request)
+    if year is None:
+        return JsonResponse({'success': False, 'message': 'Invalid year.'}, status=400)
+
+    return JsonResponse({'success': True, **attendance_breakdown(request.user, year)})
+
+@login_required
+@require_GET
+def get_attendance_history(request):
+    """API endpoint to page through the user's attendance history, newest first"""
+    before = None
+    if request.GET.get('before'):
+        before = parse_date(request.GET.get('before'))
+        if before is None:
+            return JsonResponse({'success': False, 'message': 'Invalid date format.'}, status=400)
+
+    try:
+        limit = int(request.GET.get('limit', HISTORY_PAGE_SIZE))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid limit.'}, status=400)
+    limit = max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+
+    records, next_before = history_page(
+        Attendance.objects.filter(user=request.user),
+        before=before,
+        limit=limit,
+    )
+
     return JsonResponse({
-        'total': total_count,
-        'present': present_count,
-        'absent': absent_count,
-        'school_off': school_off_count,
-        'percentage': percentage
+        'success': True,
+        'records': [
+            {
+                'date': str(record.date),
+                'day': record.day,
+                'month': record.month,
+                'status': status_of(record),
+            }
+            for record in records
+        ],
+        'next_before': str(next_before) if next_before else None,
     })
@@ -123,18 +123,55 @@ class AttendanceNotificationManager {
         // Check every minute if it's time for notification
         setInterval(() => {
             this.checkNotificationTime();
-            this.checkServerTriggers(); // Check server-side triggers
         }, 60000); // Check every minute
 
         // Also check immediately
         this.checkNotificationTime();
+
+        // Server-side triggers are pushed over SSE; poll only if streaming is unavailable
+        if (!this.startTriggerStream()) {
+            this.startTriggerPolling();
+        }
+    }
+
+    startTriggerStream() {
+        if (!('EventSource' in window)) return false;
+
+        const source = new EventSource('/notifications/stream/');
+
+        source.addEventListener('trigger', () => {
+            // Claim rather than show directly: only one open tab wins each trigger
+            this.checkServerTriggers();
+        });
+
+        source.onerror = () => {
+            // CLOSED means the server refused the stream (e.g. not running under ASGI).
+            // Otherwise the browser reconnects by itself.
+            if (source.readyState === EventSource.CLOSED) {
+                console.log('📡 Notification stream unavailable, falling back to polling');
+                this.startTriggerPolling();
+            }
+        };
+
+        console.log('📡 Listening for server notification triggers');
+        return true;
+    }
+
+    startTriggerPolling() {
+        if (this.pollTimer) return;
+
+        this.pollTimer = setInterval(() => {
+            this.checkServerTriggers();
+        }, 60000); // Check every minute
+
         this.checkServerTriggers();
     }
 
     async checkServerTriggers() {
         try {
-            const response = await fetch('/notifications/check/', {
-                method: 'GET',
+            // Fetch pending triggers and mark them read in one request
+            const response = await fetch('/notifications/claim/', {
+                method: 'POST',
                 headers: {
                     'X-CSRFToken': this.getCSRFToken(),
                     'Content-Type': 'application/json'
@@ -144,13 +181,8 @@ class AttendanceNotificationManager {
             const data = await response.json();
             
             if (data.success && data.count > 0) {
-                // Show notification for each trigger
-                for (const trigger of data.triggers) {
-                    this.showAttendanceReminder();
-                    
-                    // Mark as read
-                    await this.markTriggerAsRead(trigger.id);
-                }
+                // Triggers are all attendance reminders, so one notification covers them
+                this.showAttendanceReminder();
                 
                 console.log(`🔔 Processed ${data.count} server-side notification triggers`);
             }
@@ -159,21 +191,6 @@ class AttendanceNotificationManager {
         }
     }
 
-    async markTriggerAsRead(triggerId) {
-        try {
-            await fetch('/notifications/mark-read/', {
-                method: 'POST',
-                headers: {
-                    'X-CSRFToken': this.getCSRFToken(),
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({ trigger_id: triggerId })
-            });
-        } catch (error) {
-            console.error('Error marking trigger as read:', error);
-        }
-    }
-
     getCSRFToken() {
         // Try to get from cookie first
         const cookies = document.cookie.split("; ");